@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CharityFund, HelpRequest, CustomUser
+from .models import CharityFund, HelpRequest, CustomUser, StatusTransition
 
 # НОВАЯ АДМИНКА ДЛЯ ПОЛЬЗОВАТЕЛЯ
 @admin.register(CustomUser)
@@ -20,16 +20,37 @@ class CustomUserAdmin(UserAdmin):
 # СУЩЕСТВУЮЩИЙ КОД - оставляем как есть
 @admin.register(CharityFund)
 class CharityFundAdmin(admin.ModelAdmin):
-    list_display = ['name', 'contact_email', 'is_active', 'created_at']
+    list_display = ['name', 'contact_email', 'is_active', 'is_public', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'description']
     list_editable = ['is_active']
+    
+    def save_model(self, request, obj, form, change):
+        obj.changed_by = request.user  # смена статуса попадёт в журнал с автором
+        super().save_model(request, obj, form, change)
 
 # ОБНОВЛЯЕМ админку заявок - добавляем пользователя
 @admin.register(HelpRequest)
 class HelpRequestAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'urgency', 'user', 'address', 'contact_name', 'is_active', 'is_fulfilled', 'created_at']  # ДОБАВИЛИ 'user'
-    list_filter = ['category', 'urgency', 'is_active', 'is_fulfilled', 'created_at', 'user']  # ДОБАВИЛИ 'user'
+    list_display = ['title', 'category', 'urgency', 'region', 'user', 'address', 'contact_name', 'is_active', 'is_fulfilled', 'created_at']  # ДОБАВИЛИ 'user'
+    list_filter = ['category', 'urgency', 'region', 'is_active', 'is_fulfilled', 'created_at', 'user']  # ДОБАВИЛИ 'user'
     search_fields = ['title', 'description', 'address', 'contact_name', 'user__username']  # ДОБАВИЛИ поиск по пользователю
     list_editable = ['is_active', 'is_fulfilled']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+
+@admin.register(StatusTransition)
+class StatusTransitionAdmin(admin.ModelAdmin):
+    """Журнал только для чтения"""
+    list_display = ['object_type', 'object_id', 'from_status', 'to_status', 'actor', 'created_at']
+    list_filter = ['object_type', 'to_status', 'created_at']
+    search_fields = ['object_id', 'actor__username', 'reason']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
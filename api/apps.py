@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
-    verbose_name = 'API благотворительной платформы'
\ No newline at end of file
+    verbose_name = 'API благотворительной платформы'
+
+    def ready(self):
+        from . import signals  # noqa: F401
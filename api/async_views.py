@@ -0,0 +1,112 @@
+"""Асинхронные версии публичных списков на async ORM.
+
+Работают без аутентификации и отдают тот же JSON, что и DRF-эндпоинты для
+анонимного пользователя. Под ASGI один процесс обслуживает много медленных
+клиентов одновременно. Запрос и сериализация выполняются в потоке из пула
+(run_in_thread): acount() и async for асинхронного ORM идут через один общий
+поток thread_sensitive, и запросы всех клиентов процесса выстраивались бы в очередь.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .fast_serializers import get_field_plan
+from .models import Fundraiser
+from .serializers import CharityFundSerializer, FundraiserSerializer, HelpRequestSerializer
+from .read_model import read_model
+from .sharding import run_in_thread
+from .visibility import public_funds, sharded_help_requests, sharded_nearby_help_requests
+
+
+def _render_rows(request, serializer_class, queryset, start, stop):
+    plan = get_field_plan(serializer_class)
+    # Несколько шардов (ShardedRows): запросы к ним идут параллельно в пуле потоков
+    return plan.render(list(plan.values(queryset)[start:stop]), request)
+
+
+async def render_rows(request, serializer_class, queryset, start=0, stop=None):
+    return await run_in_thread(partial(_render_rows, request, serializer_class, queryset, start, stop))
+
+
+async def paginated_response(request, serializer_class, queryset):
+    """Страница в формате PageNumberPagination"""
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+
+    count = await run_in_thread(queryset.count)
+    last_page = max(1, -(-count // page_size))
+    if page < 1 or page > last_page:
+        return JsonResponse({'detail': 'Неправильная страница.'}, status=404)
+
+    offset = (page - 1) * page_size
+    results = await render_rows(request, serializer_class, queryset, offset, offset + page_size)
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page + 1) if page < last_page else None
+    if page == 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page - 1)
+
+    return JsonResponse({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': results,
+    })
+
+
+class AsyncHelpRequestListView(View):
+    async def get(self, request):
+        queryset = sharded_help_requests(
+            request.GET.get('category'), request.GET.get('urgency'), request.GET.get('region'),
+        )
+        return await paginated_response(request, HelpRequestSerializer, queryset)
+
+
+class AsyncNearbyHelpRequestsView(View):
+    async def get(self, request):
+        lat = request.GET.get('lat')
+        lng = request.GET.get('lng')
+        radius = request.GET.get('radius', 10)
+
+        if not lat or not lng:
+            return JsonResponse({'error': 'Требуются параметры lat и lng'}, status=400)
+
+        category = request.GET.get('category')
+        urgency = request.GET.get('urgency')
+        try:
+            lat, lng, radius = float(lat), float(lng), float(radius)
+        except ValueError:
+            return JsonResponse({'error': 'Неверные координаты'}, status=400)
+
+        body = read_model.nearby_json(lat, lng, radius, category, urgency)
+        if body is not None:
+            return HttpResponse(body, content_type='application/json')
+        queryset = sharded_nearby_help_requests(lat, lng, radius, category, urgency)
+
+        results = await render_rows(request, HelpRequestSerializer, queryset)
+        return JsonResponse(results, safe=False)
+
+
+class AsyncCharityFundListView(View):
+    async def get(self, request):
+        queryset = public_funds().order_by('-created_at')
+        return await paginated_response(request, CharityFundSerializer, queryset)
+
+
+class AsyncFundraiserListView(View):
+    async def get(self, request):
+        queryset = Fundraiser.objects.filter(status='active')
+        fund_id = request.GET.get('fund')
+        if fund_id:
+            queryset = queryset.filter(fund_id=fund_id)
+        return await paginated_response(request, FundraiserSerializer, queryset)
@@ -0,0 +1,40 @@
+"""Роутер БД: заявки на помощь живут в шарде своего региона, остальное - в default"""
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import HelpRequest
+from .sharding import database_for_region, region_for_point, shards
+
+
+class RegionRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if model is HelpRequest:
+            if isinstance(instance, HelpRequest) and instance.region:
+                return database_for_region(instance.region)
+            return None
+        if isinstance(instance, HelpRequest):
+            # Пользователи и прочие связанные объекты заявки лежат в default
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if model is HelpRequest:
+            if isinstance(instance, HelpRequest):
+                return database_for_region(instance.region or region_for_point(instance.latitude, instance.longitude))
+            return None
+        if isinstance(instance, HelpRequest):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Шарды - части одной базы, связи заявок между ними допустимы
+        if isinstance(obj1, HelpRequest) or isinstance(obj2, HelpRequest):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # В шардах создаётся только таблица заявок, остальное живёт в default
+        if db == DEFAULT_DB_ALIAS or db not in shards():
+            return None
+        return app_label == 'api' and model_name == 'helprequest'
@@ -0,0 +1,210 @@
+"""Поиск дубликатов заявок на помощь.
+
+Кандидаты отбираются дёшево (та же категория, соседние геоячейки, недавнее
+окно), затем тексты сравниваются по MinHash-сигнатурам шинглов. Сигнатура
+считается при сохранении заявки и хранится в dedup_signature, поэтому при
+создании новой заявки MinHash кандидатов заново не считается.
+"""
+import re
+import struct
+import zlib
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import HelpRequest
+from .sharding import database_for_region, region_for_point
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Фиксированные коэффициенты, чтобы сигнатуры совпадали между процессами
+_PERMUTATIONS = [
+    (1 + (i * 0x9E3779B1) % (_MERSENNE_PRIME - 1), (i * 0x85EBCA77 + 0xC2B2AE3D) % _MERSENNE_PRIME)
+    for i in range(1, NUM_PERM + 1)
+]
+
+_WORD_RE = re.compile(r'\w+')
+_SIGNATURE_FORMAT = struct.Struct(f'<{NUM_PERM}I')
+
+
+def dedup_mode():
+    return getattr(settings, 'HELP_REQUEST_DEDUP_MODE', 'flag')
+
+
+def _threshold():
+    return getattr(settings, 'HELP_REQUEST_DEDUP_THRESHOLD', 0.7)
+
+
+def _cell_size():
+    return getattr(settings, 'HELP_REQUEST_DEDUP_CELL', 0.005)
+
+
+def _max_candidates():
+    return getattr(settings, 'HELP_REQUEST_DEDUP_MAX_CANDIDATES', 200)
+
+
+def _window():
+    return timedelta(days=getattr(settings, 'HELP_REQUEST_DEDUP_WINDOW_DAYS', 14))
+
+
+def normalize_text(title, description):
+    return ' '.join(_WORD_RE.findall(f"{title} {description}".lower()))
+
+
+def shingles(text):
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(title, description):
+    """MinHash-сигнатура заголовка и описания"""
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles(normalize_text(title, description))]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def pack_signature(signature):
+    return _SIGNATURE_FORMAT.pack(*signature)
+
+
+def unpack_signature(data):
+    return _SIGNATURE_FORMAT.unpack(bytes(data))
+
+
+def text_signature(title, description):
+    """Сигнатура в виде bytes для поля dedup_signature"""
+    return pack_signature(minhash(title, description))
+
+
+def similarity(sig_a, sig_b):
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def band_keys(signature):
+    return [
+        (band, hash(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]))
+        for band in range(BANDS)
+    ]
+
+
+def geo_cell(latitude, longitude):
+    size = _cell_size()
+    return int(latitude // size), int(longitude // size)
+
+
+def neighbour_cells(cell):
+    row, col = cell
+    return [(row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+
+def find_duplicate(data, exclude_pk=None):
+    """Вернуть заявку, дубликатом которой являются данные новой заявки, или None"""
+    size = _cell_size()
+    row, col = geo_cell(data['latitude'], data['longitude'])
+
+    # Кандидаты: та же категория, соседние ячейки, недавнее окно, шард региона заявки.
+    # В плотных ячейках сравниваем только с самыми новыми
+    alias = database_for_region(data.get('region') or region_for_point(data['latitude'], data['longitude']))
+    candidates = HelpRequest.objects.using(alias).filter(
+        category=data['category'],
+        latitude__range=((row - 1) * size, (row + 2) * size),
+        longitude__range=((col - 1) * size, (col + 2) * size),
+        created_at__gte=timezone.now() - _window(),
+        is_active=True,
+        is_fulfilled=False,
+        duplicate_of__isnull=True,
+    )
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+    candidates = list(candidates.order_by('-created_at').values_list('id', 'dedup_signature')[:_max_candidates()])
+
+    # Заявки из bulk_create сохраняются без сигнатуры, для них считаем по тексту
+    missing = [pk for pk, packed in candidates if not packed]
+    texts = {}
+    if missing:
+        texts = {
+            pk: (title, description) for pk, title, description in
+            HelpRequest.objects.using(alias).filter(pk__in=missing).values_list('id', 'title', 'description')
+        }
+
+    packed = data.get('dedup_signature')
+    signature = unpack_signature(packed) if packed else minhash(data.get('title', ''), data.get('description', ''))
+    threshold = _threshold()
+    best_id, best_score = None, threshold
+    for pk, candidate in candidates:
+        if candidate:
+            candidate_signature = unpack_signature(candidate)
+        elif pk in texts:
+            candidate_signature = minhash(*texts[pk])
+        else:
+            continue
+        score = similarity(signature, candidate_signature)
+        if score >= best_score:
+            best_id, best_score = pk, score
+
+    if best_id is None:
+        return None
+    return HelpRequest.objects.using(alias).get(pk=best_id)
+
+
+def iter_duplicates(rows, threshold=None, window=None):
+    """Найти дубликаты за один проход по строкам, отсортированным по created_at.
+
+    Строки - словари с полями id, title, description, category, latitude,
+    longitude, created_at и, если есть, dedup_signature (по тексту сигнатура
+    считается только для строк без неё). Возвращает пары (id дубликата, id оригинала).
+    Вместо попарного сравнения используется LSH по полосам сигнатуры,
+    поэтому время работы линейно по числу строк.
+    """
+    threshold = _threshold() if threshold is None else threshold
+    window = _window() if window is None else window
+    buckets = {}
+    signatures = {}
+
+    for row in rows:
+        packed = row.get('dedup_signature')
+        signature = unpack_signature(packed) if packed else minhash(row['title'], row['description'])
+        cell = geo_cell(row['latitude'], row['longitude'])
+        keys = band_keys(signature)
+
+        original = None
+        seen = set()
+        for neighbour in neighbour_cells(cell):
+            for key in keys:
+                bucket = buckets.get((row['category'], neighbour, key))
+                if not bucket:
+                    continue
+                # Строки идут по времени, устаревшие записи лежат в начале
+                while bucket and row['created_at'] - bucket[0][1] > window:
+                    bucket.popleft()
+                for pk, _ in bucket:
+                    if pk in seen:
+                        continue
+                    seen.add(pk)
+                    if similarity(signature, signatures[pk]) >= threshold:
+                        original = pk
+                        break
+                if original is not None:
+                    break
+            if original is not None:
+                break
+
+        if original is not None:
+            yield row['id'], original
+            continue
+
+        signatures[row['id']] = signature
+        for key in keys:
+            buckets.setdefault((row['category'], cell, key), deque()).append((row['id'], row['created_at']))
@@ -0,0 +1,150 @@
+"""Быстрый путь сериализации для списков.
+
+Строки читаются через values(), без создания объектов моделей, а план полей
+строится один раз на класс сериализатора. Вывод совпадает с обычным путём DRF.
+"""
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Поля, значения которых из values() уже имеют нужный вид
+_PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+    serializers.RelatedField,
+)
+
+_plans = {}
+
+# Значение поля, которое DRF пропускает (пустая связь в source вида 'user.username')
+_SKIP = object()
+
+
+def choice_labels(model, field_name):
+    """Словарь значение -> подпись для поля с choices"""
+    return {str(value): str(label) for value, label in model._meta.get_field(field_name).flatchoices}
+
+
+def file_url(name):
+    """URL файла по имени из values(), как obj.image.url"""
+    return default_storage.url(name) if name else None
+
+
+class FieldPlan:
+    """Заранее вычисленный план полей сериализатора"""
+
+    def __init__(self, entries):
+        # entries: (имя поля, lookups для values(), функция преобразования, нужен ли request)
+        self.entries = entries
+        self.lookups = list(dict.fromkeys(lookup for _, lookups, _, _ in entries for lookup in lookups))
+        self.has_skippable = any(convert is _SKIP for _, _, convert, _ in entries)
+
+    def values(self, queryset):
+        return queryset.values(*self.lookups)
+
+    def render(self, rows, request=None):
+        getters = [(name, self._getter(lookups, convert, needs_request, request))
+                   for name, lookups, convert, needs_request in self.entries]
+        if self.has_skippable:
+            return [{name: value for name, getter in getters if (value := getter(row)) is not _SKIP}
+                    for row in rows]
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+    @staticmethod
+    def _getter(lookups, convert, needs_request, request):
+        if convert is _SKIP:
+            relation, lookup = lookups
+            return lambda row: _SKIP if row[relation] is None else row[lookup]
+        if len(lookups) > 1:
+            get = itemgetter(*lookups)
+            return lambda row: convert(*get(row))
+
+        lookup = lookups[0]
+        if convert is None:
+            return itemgetter(lookup)
+        if needs_request:
+            if request is None:
+                return lambda row: file_url(row[lookup])
+            return lambda row: request.build_absolute_uri(url) if (url := file_url(row[lookup])) else None
+        return lambda row: None if (value := row[lookup]) is None else convert(value)
+
+
+def _build_plan(serializer_class):
+    model = serializer_class.Meta.model
+    explicit = getattr(serializer_class, 'fast_fields', {})
+    entries = []
+
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if name in explicit:
+            lookups, convert = explicit[name]
+            entries.append((name, tuple(lookups), convert, False))
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            return None
+
+        source = field.source
+        if source.startswith('get_') and source.endswith('_display'):
+            labels = choice_labels(model, source[4:-8])
+            entries.append((name, (source[4:-8],), labels.get, False))
+            continue
+
+        lookup = source.replace('.', '__')
+        relation = source.split('.')[0]
+        try:
+            # Источник должен быть полем модели, а не свойством
+            model._meta.get_field(relation)
+        except FieldDoesNotExist:
+            return None
+
+        if relation != source:
+            if not isinstance(field, _PASSTHROUGH_FIELDS) or source.count('.') > 1:
+                return None
+            # DRF не выводит поле, если связь пустая
+            entries.append((name, (relation, lookup), _SKIP, False))
+        elif isinstance(field, serializers.FileField):
+            entries.append((name, (lookup,), file_url, True))
+        elif isinstance(field, _PASSTHROUGH_FIELDS):
+            entries.append((name, (lookup,), None, False))
+        else:
+            entries.append((name, (lookup,), field.to_representation, False))
+
+    return FieldPlan(entries)
+
+
+def get_field_plan(serializer_class):
+    """План полей для сериализатора или None, если быстрый путь невозможен"""
+    if serializer_class not in _plans:
+        _plans[serializer_class] = _build_plan(serializer_class)
+    return _plans[serializer_class]
+
+
+class FastListMixin:
+    """Отдаёт списки через values() и план полей вместо ModelSerializer"""
+
+    def fast_response(self, queryset, paginate=True):
+        plan = get_field_plan(self.get_serializer_class())
+        if plan is None:
+            return None
+
+        request = getattr(self, 'request', None)
+        rows = plan.values(queryset)
+        if paginate:
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(plan.render(page, request))
+        return Response(plan.render(rows, request))
+
+    def list(self, request, *args, **kwargs):
+        response = self.fast_response(self.filter_queryset(self.get_queryset()))
+        if response is None:
+            return super().list(request, *args, **kwargs)
+        return response
@@ -0,0 +1,73 @@
+"""Кэшированный статус подключения к БД для health/readiness проверок.
+
+Статус обновляется фоновым потоком, поэтому проба оркестратора не ходит в БД
+на каждый запрос. Кроме подключения проверяется, что применены все миграции:
+SELECT 1 проходит и на пустой базе без таблиц.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+class ConnectivityMonitor:
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {'connected': None, 'error': None, 'pending_migrations': None, 'checked_at': None}
+        self._migrated = False
+
+    def probe(self):
+        """Синхронная проверка БД, обновляет кэш"""
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            status = {'connected': True, 'error': None, 'pending_migrations': self.pending_migrations()}
+        except Exception as e:
+            status = {'connected': False, 'error': str(e), 'pending_migrations': None}
+        status['checked_at'] = time.time()
+        with self._lock:
+            self._status = status
+        return status
+
+    def pending_migrations(self):
+        """Число неприменённых миграций; после нуля граф миграций больше не читаем"""
+        if self._migrated:
+            return 0
+        executor = MigrationExecutor(connection)
+        pending = len(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+        self._migrated = pending == 0
+        return pending
+
+    def is_ready(self, status):
+        return bool(status['connected']) and status['pending_migrations'] == 0
+
+    def status(self):
+        self.start()
+        with self._lock:
+            return dict(self._status)
+
+    def is_fresh(self, status):
+        return status['checked_at'] is not None and time.time() - status['checked_at'] <= self.interval * 2
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='db-health-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.probe()
+            # Соединение фонового потока не держим открытым между проверками
+            connection.close()
+            time.sleep(self.interval)
+
+
+monitor = ConnectivityMonitor(getattr(settings, 'HEALTH_CHECK_INTERVAL', 10))
@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.fast_serializers import get_field_plan
+from api.models import CharityFund, CustomUser, Fundraiser, HelpRequest
+from api.serializers import CharityFundSerializer, FundraiserSerializer, HelpRequestSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает обычную и быструю сериализацию списков (данные создаются и откатываются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._fill(options['rows'])
+                self._run(options['rows'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _fill(self, rows):
+        now = timezone.now()
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f'bench_user_{i}', role='fund_creator') for i in range(10)
+        )
+        funds = CharityFund.objects.bulk_create(
+            CharityFund(
+                name=f'Фонд {i}', description='Описание фонда', creator=users[i % len(users)],
+                status='approved', image='funds/logo.png' if i % 2 else '',
+            )
+            for i in range(rows)
+        )
+        Fundraiser.objects.bulk_create(
+            Fundraiser(
+                fund=funds[i % len(funds)], title=f'Сбор {i}', description='Описание сбора',
+                goal_amount=Decimal('1000.00'), current_amount=Decimal(i % 1200),
+                start_date=now, end_date=now + timedelta(days=30),
+            )
+            for i in range(rows)
+        )
+        categories = [value for value, _ in HelpRequest.CATEGORY_CHOICES]
+        urgencies = [value for value, _ in HelpRequest.URGENCY_CHOICES]
+        HelpRequest.objects.bulk_create(
+            HelpRequest(
+                title=f'Заявка {i}', description='Описание заявки', category=categories[i % len(categories)],
+                urgency=urgencies[i % len(urgencies)], address='ул. Ленина, 1',
+                latitude=55.75 + i * 1e-4, longitude=37.61 + i * 1e-4,
+                contact_name='Иван', contact_phone='+70000000000',
+                user=users[i % len(users)] if i % 3 else None,
+            )
+            for i in range(rows)
+        )
+
+    def _run(self, rows, repeat):
+        request = Request(RequestFactory().get('/api/', HTTP_HOST='localhost'))
+        renderer = JSONRenderer()
+        cases = [
+            ('funds', CharityFundSerializer, CharityFund.objects.filter(status='approved')),
+            ('fundraisers', FundraiserSerializer, Fundraiser.objects.filter(status='active')),
+            ('help-requests', HelpRequestSerializer, HelpRequest.objects.filter(is_active=True)),
+        ]
+
+        for name, serializer_class, queryset in cases:
+            queryset = queryset.order_by('-id')[:rows]
+            plan = get_field_plan(serializer_class)
+            if plan is None:
+                raise CommandError(f'Для {serializer_class.__name__} нет быстрого пути')
+
+            def slow():
+                return serializer_class(queryset.all(), many=True, context={'request': request}).data
+
+            def fast():
+                return plan.render(plan.values(queryset.all()), request)
+
+            if renderer.render(slow()) != renderer.render(fast()):
+                raise CommandError(f'{name}: вывод быстрого пути отличается')
+
+            slow_time = self._best(slow, repeat)
+            fast_time = self._best(fast, repeat)
+            self.stdout.write(
+                f'{name:<15} DRF: {slow_time * 1000:8.1f} мс  '
+                f'быстрый: {fast_time * 1000:8.1f} мс  ускорение: x{slow_time / fast_time:.1f}'
+            )
+
+    @staticmethod
+    def _best(func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.dedup import iter_duplicates
+from api.models import HelpRequest
+from api.sharding import shards
+
+
+class Command(BaseCommand):
+    help = 'Находит дубликаты активных заявок на помощь за один проход по таблице'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=None, help='Порог сходства текстов (0..1)')
+        parser.add_argument('--window-days', type=int, default=None, help='Окно поиска дубликатов в днях')
+        parser.add_argument('--merge', action='store_true', help='Деактивировать найденные дубликаты')
+        parser.add_argument('--dry-run', action='store_true', help='Только вывести найденные пары')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Дубликаты ищем внутри шарда: похожие заявки лежат в одном регионе
+        found = 0
+        for alias in shards():
+            found += self._dedupe(alias, options)
+        self.stdout.write(self.style.SUCCESS(f"Найдено дубликатов: {found}"))
+
+    def _dedupe(self, alias, options):
+        window = options['window_days']
+        rows = (
+            HelpRequest.objects.using(alias)
+            .filter(is_active=True, is_fulfilled=False, duplicate_of__isnull=True)
+            .order_by('created_at', 'id')
+            .values('id', 'title', 'description', 'category', 'latitude', 'longitude', 'created_at',
+                    'dedup_signature')
+            .iterator(chunk_size=options['batch_size'])
+        )
+        # Пары собираем до записи, чтобы не менять таблицу во время чтения
+        pairs = list(iter_duplicates(
+            rows,
+            threshold=options['threshold'],
+            window=timedelta(days=window) if window is not None else None,
+        ))
+
+        if options['dry_run']:
+            for duplicate_id, original_id in pairs:
+                self.stdout.write(f"{duplicate_id} -> {original_id}")
+        else:
+            # bulk_update не трогает auto_now: без updated_at модели чтения не
+            # увидят изменение по курсору до полной перестройки
+            now = timezone.now()
+            HelpRequest.objects.using(alias).bulk_update(
+                [
+                    HelpRequest(
+                        id=duplicate_id, duplicate_of_id=original_id, is_active=not options['merge'], updated_at=now,
+                    )
+                    for duplicate_id, original_id in pairs
+                ],
+                ['duplicate_of', 'is_active', 'updated_at'],
+                batch_size=options['batch_size'],
+            )
+        return len(pairs)
@@ -0,0 +1,211 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from api.models import CharityFund, CustomUser, Fundraiser, HelpRequest, HelpRequestTicket
+from api.sharding import database_for_region, is_sharded, region_for_point
+
+USERNAME_PREFIX = 'scale_'
+PROGRESS_EVERY = 20  # батчей между строками прогресса
+
+# Центры городов и их доля заявок: точки кластеризуются вокруг центров
+CITIES = [
+    ((55.7558, 37.6173), 0.40),  # Москва
+    ((59.9343, 30.3351), 0.20),  # Санкт-Петербург
+    ((55.7961, 49.1064), 0.10),  # Казань
+    ((56.8389, 60.6057), 0.10),  # Екатеринбург
+    ((55.0084, 82.9357), 0.10),  # Новосибирск
+    ((45.0355, 38.9753), 0.10),  # Краснодар
+]
+
+CATEGORY_WEIGHTS = {'food': 45, 'medicine': 25, 'clothes': 15, 'household': 10, 'other': 5}
+URGENCY_WEIGHTS = {'medium': 45, 'high': 25, 'low': 20, 'critical': 10}
+FUND_STATUS_WEIGHTS = {'approved': 70, 'pending': 20, 'rejected': 10}
+STREETS = ['Ленина', 'Мира', 'Гагарина', 'Пушкина', 'Советская', 'Садовая', 'Лесная', 'Центральная']
+
+
+@contextmanager
+def explicit_dates(*models):
+    """Отключает auto_now/auto_now_add, чтобы bulk_create сохранил сгенерированные даты"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Генерирует реалистичные данные для нагрузочных проверок (кластеры по городам, перекос категорий)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--help-requests', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--funds', type=int, default=5000)
+        parser.add_argument('--fundraisers', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Удалить ранее сгенерированные данные')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.now = timezone.now()
+        batch_size = options['batch_size']
+
+        if options['clear']:
+            deleted, _ = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f"Удалено объектов: {deleted}")
+
+        with explicit_dates(CharityFund, Fundraiser, HelpRequest):
+            user_ids, creator_ids = self._users(options['users'], batch_size)
+            fund_ids = self._funds(options['funds'], creator_ids, batch_size)
+            self._fundraisers(options['fundraisers'], fund_ids, batch_size)
+            self._help_requests(options['help_requests'], user_ids, batch_size)
+
+    def _weighted(self, weights, k):
+        return self.random.choices(list(weights), weights=list(weights.values()), k=k)
+
+    def _date(self, days=365):
+        # Свежие записи встречаются чаще старых
+        return self.now - timedelta(days=days * self.random.random() ** 2)
+
+    def _write(self, model, batch, batch_size, database, prepare):
+        if prepare:
+            prepare(batch)
+        # database(obj) -> алиас БД; bulk_create роутер не спрашивает, раскладываем сами
+        by_alias = {}
+        for obj in batch:
+            by_alias.setdefault(database(obj) if database else DEFAULT_DB_ALIAS, []).append(obj)
+        for alias, objects in by_alias.items():
+            with transaction.atomic(using=alias):
+                model.objects.using(alias).bulk_create(objects, batch_size=batch_size)
+
+    def _bulk(self, model, objects, batch_size, database=None, prepare=None):
+        batch, created, batches = [], 0, 0
+        started = time.perf_counter()
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                self._write(model, batch, batch_size, database, prepare)
+                created += len(batch)
+                batches += 1
+                batch = []
+                if batches % PROGRESS_EVERY == 0:
+                    self.stdout.write(f"  {model.__name__}: {created}...")
+        if batch:
+            self._write(model, batch, batch_size, database, prepare)
+            created += len(batch)
+        self.stdout.write(f"  {model.__name__}: {created} за {time.perf_counter() - started:.1f} с")
+
+    def _users(self, count, batch_size):
+        start = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        roles = self._weighted({'user': 85, 'fund_creator': 14, 'admin': 1}, count)
+        self._bulk(CustomUser, (
+            CustomUser(username=f'{USERNAME_PREFIX}{start + i}', password='!', role=roles[i])
+            for i in range(count)
+        ), batch_size)
+        users = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX)
+        return (
+            list(users.values_list('id', flat=True)),
+            list(users.filter(role='fund_creator').values_list('id', flat=True)),
+        )
+
+    def _funds(self, count, creator_ids, batch_size):
+        if not creator_ids:
+            return []
+        statuses = self._weighted(FUND_STATUS_WEIGHTS, count)
+
+        def funds():
+            for i in range(count):
+                created = self._date()
+                is_active = self.random.random() < 0.95
+                yield CharityFund(
+                    name=f'Фонд {self.random.choice(STREETS)} {i}',
+                    description='Сгенерированный фонд',
+                    creator_id=self.random.choice(creator_ids),
+                    status=statuses[i],
+                    is_active=is_active,
+                    is_public=statuses[i] == 'approved' and is_active,
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        self._bulk(CharityFund, funds(), batch_size)
+        return list(CharityFund.objects.filter(creator__username__startswith=USERNAME_PREFIX).values_list('id', flat=True))
+
+    def _fundraisers(self, count, fund_ids, batch_size):
+        if not fund_ids:
+            return
+        statuses = self._weighted({'active': 60, 'completed': 30, 'cancelled': 10}, count)
+
+        def fundraisers():
+            for i in range(count):
+                start = self._date()
+                goal = Decimal(self.random.randrange(10000, 1000000))
+                yield Fundraiser(
+                    fund_id=self.random.choice(fund_ids),
+                    title=f'Сбор {i}',
+                    description='Сгенерированный сбор',
+                    goal_amount=goal,
+                    current_amount=(goal * Decimal(self.random.random())).quantize(Decimal('0.01')),
+                    status=statuses[i],
+                    start_date=start,
+                    end_date=start + timedelta(days=self.random.randrange(7, 180)),
+                    created_at=start,
+                )
+
+        self._bulk(Fundraiser, fundraisers(), batch_size)
+
+    def _help_requests(self, count, user_ids, batch_size):
+        centers = [center for center, _ in CITIES]
+        city_weights = [weight for _, weight in CITIES]
+        categories = self._weighted(CATEGORY_WEIGHTS, count)
+        urgencies = self._weighted(URGENCY_WEIGHTS, count)
+        gauss = self.random.gauss
+
+        def help_requests():
+            for i in range(count):
+                lat, lng = self.random.choices(centers, weights=city_weights)[0]
+                # Плотное ядро города и более редкие окраины
+                spread = 0.03 if self.random.random() < 0.6 else 0.15
+                created = self._date()
+                help_request = HelpRequest(
+                    title=f'Нужна помощь: {categories[i]}',
+                    description='Сгенерированная заявка',
+                    category=categories[i],
+                    urgency=urgencies[i],
+                    address=f'ул. {self.random.choice(STREETS)}, {self.random.randrange(1, 200)}',
+                    latitude=lat + gauss(0, spread),
+                    longitude=lng + gauss(0, spread * 1.6),
+                    contact_name='Тест',
+                    contact_phone='+70000000000',
+                    is_active=self.random.random() < 0.9,
+                    is_fulfilled=self.random.random() < 0.2,
+                    created_at=created,
+                    updated_at=created,
+                    user_id=self.random.choice(user_ids) if user_ids else None,
+                )
+                help_request.region = region_for_point(help_request.latitude, help_request.longitude)
+                yield help_request
+
+        self._bulk(HelpRequest, help_requests(), batch_size,
+                   database=lambda obj: database_for_region(obj.region),
+                   prepare=self._ticket_ids if is_sharded() else None)
+
+    def _ticket_ids(self, batch):
+        # id заявок из общей таблицы, чтобы не пересекались между шардами
+        tickets = HelpRequestTicket.objects.bulk_create([HelpRequestTicket() for _ in batch])
+        for obj, ticket in zip(batch, tickets):
+            obj.pk = ticket.pk
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе с -X importtime, чтобы мерить холодный старт
+PROBE = r'''
+import io, json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+app_done = time.perf_counter()
+path, _, query = sys.argv[1].partition('?')
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+}
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+first_request = time.perf_counter()
+print(json.dumps({
+    'setup': setup_done - start,
+    'application': app_done - setup_done,
+    'first_request': first_request - app_done,
+    'status': statuses[0] if statuses else None,
+    'modules': len(sys.modules),
+}))
+'''
+
+_IMPORT_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Профиль холодного старта: время импорта по модулям и время до первого запроса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', default=None,
+                            help='Профилируемые настройки (по умолчанию текущие)')
+        parser.add_argument('--path', default='/api/health/', help='URL первого запроса')
+        parser.add_argument('--top', type=int, default=15)
+
+    def handle(self, *args, **options):
+        settings_module = options['settings_module'] or settings.SETTINGS_MODULE
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, options['path']],
+            env=env, capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        total = time.perf_counter() - started
+        if result.returncode != 0:
+            raise CommandError(result.stderr[-2000:])
+
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = self._parse_imports(result.stderr)
+        top = options['top']
+
+        self.stdout.write(f"Настройки: {settings_module}")
+        self.stdout.write(f"Процесс целиком:      {total * 1000:8.1f} мс")
+        self.stdout.write(f"django.setup():       {timings['setup'] * 1000:8.1f} мс")
+        self.stdout.write(f"Загрузка приложения:  {timings['application'] * 1000:8.1f} мс")
+        self.stdout.write(f"Первый запрос:        {timings['first_request'] * 1000:8.1f} мс ({timings['status']})")
+        self.stdout.write(f"Модулей загружено:    {timings['modules']}")
+
+        by_package = defaultdict(int)
+        for name, self_us, _ in imports:
+            by_package[name.split('.')[0]] += self_us
+        self.stdout.write(f"\nПакеты по собственному времени импорта (топ {top}):")
+        for name, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} мс  {name}")
+
+        self.stdout.write(f"\nМодули по накопленному времени импорта (топ {top}):")
+        for name, _, cumulative_us in sorted(imports, key=lambda item: -item[2])[:top]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} мс  {name}")
+
+    @staticmethod
+    def _parse_imports(stderr):
+        imports = []
+        for line in stderr.splitlines():
+            match = _IMPORT_RE.match(line)
+            if match:
+                self_us, cumulative_us, _, name = match.groups()
+                imports.append((name, int(self_us), int(cumulative_us)))
+        return imports
@@ -0,0 +1,147 @@
+import json
+import re
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.models import CharityFund, CustomUser
+from api.moderation import moderation_queue, pending_funds
+from api.visibility import (
+    active_help_requests, nearby_help_requests, owned_fundraisers, owned_funds, visible_funds
+)
+
+PAGE_SIZE = 20
+# Строк результата на мс, ниже которых медленный запрос считается подозрительным:
+# индекс с плохой селективностью обходит почти всю таблицу ради нескольких строк
+ROWS_PER_MS = 1000
+
+# Признаки полного сканирования и сортировки без индекса в планах SQLite и PostgreSQL
+_WARNINGS = {
+    'sqlite': [
+        (re.compile(r'\bSCAN (\w+)\b(?! USING)'), 'полный скан {0}'),
+        (re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)'), 'сортировка без индекса ({0})'),
+    ],
+    'postgresql': [
+        (re.compile(r'Seq Scan on (\w+)'), 'полный скан {0}'),
+        (re.compile(r'Sort Key: (.+)'), 'сортировка без индекса ({0})'),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = 'Замеряет основные запросы API на текущих данных и выводит EXPLAIN с подсветкой полных сканов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (только PostgreSQL)')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+        parser.add_argument('--slow-ms', type=float, default=20.0,
+                            help='Порог медианы, выше которого запрос с малым результатом помечается')
+        parser.add_argument('--skip-analyze', action='store_true',
+                            help='Не обновлять статистику планировщика (ANALYZE) перед замерами: '
+                                 'статистика сохраняется в БД и меняет планы приложения')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in _WARNINGS:
+            raise CommandError(f'Неподдерживаемая БД: {vendor}')
+
+        if not options['skip_analyze']:
+            # Без статистики SQLite выбирает индекс по виду условия, а не по селективности
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.stdout.write(f"ANALYZE: {(time.perf_counter() - start) * 1000:.0f} мс")
+
+        creator = (
+            CustomUser.objects.filter(role='fund_creator', created_funds__isnull=False).order_by('id').first()
+        )
+        admin = CustomUser.objects.filter(role='admin').order_by('id').first()
+        counts = {
+            'help_requests': active_help_requests().count(),
+            'funds': CharityFund.objects.count(),
+        }
+        self.stdout.write(f"БД: {vendor}, активных заявок: {counts['help_requests']}, фондов: {counts['funds']}\n")
+
+        results = [self._run(name, queryset, vendor, options) for name, queryset in self._cases(creator, admin)]
+
+        flagged = [result for result in results if result['warnings']]
+        self.stdout.write(self.style.MIGRATE_HEADING('\nИтог'))
+        for result in results:
+            line = f"  {result['name']:<40} {result['median_ms']:9.2f} мс"
+            if result['warnings']:
+                self.stdout.write(self.style.WARNING(f"{line}  ⚠ {'; '.join(result['warnings'])}"))
+            else:
+                self.stdout.write(line)
+        self.stdout.write(f"\nПодозрительных запросов (полный скан, сортировка без индекса, "
+                          f"медленно для малого результата): {len(flagged)} из {len(results)}")
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump({'vendor': vendor, 'counts': counts, 'results': results}, f, ensure_ascii=False, indent=2)
+
+    def _cases(self, creator, admin):
+        # Запросы в том виде, в каком их строят представления, + первая страница
+        yield 'help-requests: все', active_help_requests()
+        yield 'help-requests: category=food', active_help_requests('food')
+        yield 'help-requests: urgency=critical', active_help_requests(urgency='critical')
+        yield 'help-requests: category+urgency', active_help_requests('medicine', 'high')
+        yield 'nearby: центр Москвы, 2 км', nearby_help_requests(55.7558, 37.6173, 2)
+        yield 'nearby: центр Москвы, 10 км', nearby_help_requests(55.7558, 37.6173, 10)
+        yield 'nearby: пустой район, 10 км', nearby_help_requests(70.0, 100.0, 10)
+        yield 'funds: аноним', visible_funds(AnonymousUser(), combine=True).order_by('-created_at')
+        if creator:
+            yield 'funds: создатель (UNION)', visible_funds(creator, combine=True).order_by('-created_at')
+            yield 'funds: создатель (OR, detail)', visible_funds(creator).order_by('-created_at')
+            yield 'my-funds', owned_funds(creator).order_by('-created_at')
+            yield 'my-fundraisers', owned_fundraisers(creator).order_by('-created_at')
+        if admin:
+            yield 'funds: админ', visible_funds(admin, combine=True).order_by('-created_at')
+        yield 'admin: фонды на проверке', pending_funds().order_by('-created_at')
+        if admin:
+            yield 'admin: очередь модерации', moderation_queue(admin)
+
+    def _run(self, name, queryset, vendor, options):
+        page = queryset[:PAGE_SIZE]
+        timings = []
+        rows = 0
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            total = queryset.count()
+            rows = len(list(page))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        explain_options = {'analyze': True} if options['analyze'] and vendor == 'postgresql' else {}
+        plan = page.explain(**explain_options)
+        count_plan = queryset.order_by().explain()
+        warnings = sorted({
+            template.format(match.group(1).strip())
+            for text in (plan, count_plan)
+            for pattern, template in _WARNINGS[vendor]
+            for match in pattern.finditer(text)
+        })
+        median_ms = statistics.median(timings)
+        if median_ms >= options['slow_ms'] and total < median_ms * ROWS_PER_MS:
+            # План может выглядеть как SEARCH по индексу и всё равно обходить всю таблицу
+            warnings.append(f'медленно для результата: {median_ms:.0f} мс на {total} строк')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(f"  count={total} страница={rows} медиана {median_ms:.2f} мс")
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
+        for warning in warnings:
+            self.stdout.write(self.style.WARNING(f"  ⚠ {warning}"))
+
+        return {
+            'name': name,
+            'count': total,
+            'page_rows': rows,
+            'median_ms': median_ms,
+            'timings_ms': timings,
+            'plan': plan,
+            'count_plan': count_plan,
+            'warnings': warnings,
+        }
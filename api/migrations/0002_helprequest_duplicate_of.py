@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='helprequest',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='api.helprequest', verbose_name='Дубликат заявки'),
+        ),
+        migrations.AddIndex(
+            model_name='helprequest',
+            index=models.Index(fields=['category', 'latitude', 'longitude'], name='helprequest_dedup_idx'),
+        ),
+    ]
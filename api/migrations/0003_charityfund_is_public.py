@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+def fill_is_public(apps, schema_editor):
+    CharityFund = apps.get_model('api', 'CharityFund')
+    CharityFund.objects.filter(status='approved', is_active=True).update(is_public=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_helprequest_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='charityfund',
+            name='is_public',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Публичный'),
+        ),
+        migrations.RunPython(fill_is_public, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='charityfund',
+            index=models.Index(fields=['is_public', '-created_at'], name='fund_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='charityfund',
+            index=models.Index(fields=['status', '-created_at'], name='fund_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='charityfund',
+            index=models.Index(fields=['creator', '-created_at'], name='fund_creator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundraiser',
+            index=models.Index(fields=['fund', 'status'], name='fundraiser_fund_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundraiser',
+            index=models.Index(fields=['status', '-created_at'], name='fundraiser_status_idx'),
+        ),
+    ]
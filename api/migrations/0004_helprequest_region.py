@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Регионы на момент миграции, а не текущие настройки: повторный прогон должен
+# давать тот же результат (юг, запад, север, восток)
+REGIONS = [
+    ('moscow', (54.8, 36.3, 56.6, 39.0)),
+    ('spb', (59.4, 29.0, 60.5, 31.3)),
+    ('kazan', (55.3, 48.3, 56.3, 49.9)),
+    ('yekaterinburg', (56.3, 59.7, 57.4, 61.5)),
+    ('novosibirsk', (54.5, 82.1, 55.5, 83.8)),
+    ('krasnodar', (44.5, 38.1, 45.6, 39.8)),
+]
+DEFAULT_REGION = 'other'
+
+
+def fill_region(apps, schema_editor):
+    # Порядок как в region_for_point: точка достаётся первому подходящему региону
+    HelpRequest = apps.get_model('api', 'HelpRequest')
+    help_requests = HelpRequest.objects.using(schema_editor.connection.alias)
+    for name, (south, west, north, east) in REGIONS:
+        help_requests.filter(
+            region='', latitude__range=(south, north), longitude__range=(west, east),
+        ).update(region=name)
+    help_requests.filter(region='').update(region=DEFAULT_REGION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_charityfund_is_public'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HelpRequestTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Номер заявки',
+                'verbose_name_plural': 'Номера заявок',
+            },
+        ),
+        migrations.AddField(
+            model_name='helprequest',
+            name='region',
+            field=models.CharField(blank=True, db_index=True, max_length=32, verbose_name='Регион'),
+        ),
+        migrations.RunPython(fill_region, migrations.RunPython.noop, hints={'model_name': 'helprequest'}),
+        migrations.AlterField(
+            model_name='helprequest',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='api.helprequest', verbose_name='Дубликат заявки'),
+        ),
+        migrations.AlterField(
+            model_name='helprequest',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='help_requests', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_helprequest_region'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('fund', 'Фонд'), ('fundraiser', 'Сбор')], max_length=20, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('from_status', models.CharField(blank=True, max_length=20, verbose_name='Был статус')),
+                ('to_status', models.CharField(max_length=20, verbose_name='Новый статус')),
+                ('reason', models.TextField(blank=True, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса',
+                'verbose_name_plural': 'Журнал статусов',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='charityfund',
+            name='fund_public_idx',
+        ),
+        migrations.AddField(
+            model_name='charityfund',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Закреплён до'),
+        ),
+        migrations.AddField(
+            model_name='charityfund',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_funds', to=settings.AUTH_USER_MODEL, verbose_name='Проверяет'),
+        ),
+        migrations.AddIndex(
+            model_name='charityfund',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-created_at'], name='fund_public_idx'),
+        ),
+        migrations.AddField(
+            model_name='statustransition',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_transitions', to=settings.AUTH_USER_MODEL, verbose_name='Кто изменил'),
+        ),
+        migrations.AddIndex(
+            model_name='statustransition',
+            index=models.Index(fields=['object_type', 'object_id', '-created_at'], name='transition_object_idx'),
+        ),
+    ]
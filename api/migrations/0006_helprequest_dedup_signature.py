@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_moderation_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='helprequest',
+            name='dedup_signature',
+            field=models.BinaryField(blank=True, default=b'', verbose_name='Сигнатура текста'),
+        ),
+    ]
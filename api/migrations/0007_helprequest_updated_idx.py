@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_helprequest_dedup_signature'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='helprequest',
+            index=models.Index(fields=['updated_at'], name='helprequest_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_helprequest_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HelpRequestTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('help_request_id', models.BigIntegerField(verbose_name='ID заявки')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённая заявка',
+                'verbose_name_plural': 'Удалённые заявки',
+            },
+        ),
+    ]
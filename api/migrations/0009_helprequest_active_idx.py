@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_helprequesttombstone'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='helprequest',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='api.helprequest', verbose_name='Дубликат заявки'),
+        ),
+        migrations.AddIndex(
+            model_name='helprequest',
+            index=models.Index(condition=models.Q(('duplicate_of__isnull', False)), fields=['duplicate_of'], name='helprequest_duplicates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='helprequest',
+            index=models.Index(condition=models.Q(('duplicate_of__isnull', True), ('is_active', True), ('is_fulfilled', False)), fields=['-created_at', 'category', 'urgency', 'latitude', 'longitude'], name='helprequest_active_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import AbstractUser
 
+from .sharding import is_sharded, region_for_point
+
 class CustomUser(AbstractUser):
     USER_ROLES = [
         ('user', 'Обычный пользователь'),
@@ -20,7 +22,52 @@ class CustomUser(AbstractUser):
         return self.username
 
 
-class CharityFund(models.Model):
+class StatusAuditMixin(models.Model):
+    """Смена status пишется в StatusTransition в той же транзакции, что и сохранение"""
+    AUDIT_OBJECT_TYPE = None
+
+    # Кто и почему меняет статус, выставляется во view перед save()
+    changed_by = None
+    change_reason = ''
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get('status')  # None, если поле отложено
+        return instance
+
+    def audit_actor_id(self):
+        return self.changed_by.pk if self.changed_by else None
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        previous = '' if adding else getattr(self, '_saved_status', None)
+        update_fields = kwargs.get('update_fields')
+        changed = (
+            previous is not None and previous != self.status
+            and (update_fields is None or 'status' in update_fields)
+        )
+        actor_id = self.audit_actor_id() if changed else None
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if changed:
+                StatusTransition.objects.using(using).create(
+                    object_type=self.AUDIT_OBJECT_TYPE,
+                    object_id=self.pk,
+                    from_status=previous,
+                    to_status=self.status,
+                    actor_id=actor_id,
+                    reason=self.change_reason,
+                )
+        self._saved_status = self.status
+        self.changed_by, self.change_reason = None, ''
+
+
+class CharityFund(StatusAuditMixin):
     STATUS_CHOICES = [
         ('pending', 'На проверке'),
         ('approved', 'Одобрен'),
@@ -38,19 +85,53 @@ class CharityFund(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
     rejection_reason = models.TextField(blank=True, verbose_name="Причина отклонения")
     
+    # Очередь модерации: фонд на проверке закрепляется за админом до claim_expires_at
+    claimed_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        related_name='claimed_funds',
+        verbose_name="Проверяет",
+        null=True,
+        blank=True
+    )
+    claim_expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Закреплён до")
+    
     is_active = models.BooleanField(default=True, verbose_name="Активный")
+    # Денормализовано: одобрен и активен, пересчитывается в save()
+    is_public = models.BooleanField(default=False, editable=False, verbose_name="Публичный")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     
     class Meta:
         verbose_name = "Благотворительный фонд"
         verbose_name_plural = "Благотворительные фонды"
+        indexes = [
+            # Частичный индекс: SQLite не применяет составной к условию WHERE "is_public" без "= 1"
+            models.Index(fields=['-created_at'], condition=models.Q(is_public=True), name='fund_public_idx'),
+            models.Index(fields=['status', '-created_at'], name='fund_status_idx'),
+            models.Index(fields=['creator', '-created_at'], name='fund_creator_idx'),
+        ]
     
+    AUDIT_OBJECT_TYPE = 'fund'
+
     def __str__(self):
         return self.name
+    
+    def audit_actor_id(self):
+        # Фонд создаёт его владелец
+        if self.changed_by is None and self._state.adding:
+            return self.creator_id
+        return super().audit_actor_id()
+    
+    def save(self, *args, **kwargs):
+        self.is_public = self.status == 'approved' and self.is_active
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'status', 'is_active'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'is_public'}
+        super().save(*args, **kwargs)
 
 
-class Fundraiser(models.Model):
+class Fundraiser(StatusAuditMixin):
     """Сбор средств от фонда"""
     STATUS_CHOICES = [
         ('active', 'Активный'),
@@ -75,17 +156,85 @@ class Fundraiser(models.Model):
         verbose_name = "Сбор средств"
         verbose_name_plural = "Сборы средств"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fund', 'status'], name='fundraiser_fund_status_idx'),
+            models.Index(fields=['status', '-created_at'], name='fundraiser_status_idx'),
+        ]
     
+    AUDIT_OBJECT_TYPE = 'fundraiser'
+
     def __str__(self):
         return f"{self.title} ({self.fund.name})"
     
+    def audit_actor_id(self):
+        # Сбор создаёт владелец фонда
+        if self.changed_by is None and self._state.adding:
+            return self.fund.creator_id
+        return super().audit_actor_id()
+    
     @property
     def progress_percentage(self):
-        if self.goal_amount > 0:
-            return min(100, (float(self.current_amount) / float(self.goal_amount)) * 100)
+        return self.calculate_progress(self.goal_amount, self.current_amount)
+    
+    @staticmethod
+    def calculate_progress(goal_amount, current_amount):
+        if goal_amount > 0:
+            return min(100, (float(current_amount) / float(goal_amount)) * 100)
         return 0
 
 
+class StatusTransition(models.Model):
+    """Журнал смены статусов фондов и сборов, только добавление записей"""
+    OBJECT_TYPES = [
+        ('fund', 'Фонд'),
+        ('fundraiser', 'Сбор'),
+    ]
+
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPES, verbose_name="Тип объекта")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    from_status = models.CharField(max_length=20, blank=True, verbose_name="Был статус")
+    to_status = models.CharField(max_length=20, verbose_name="Новый статус")
+    actor = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        related_name='status_transitions',
+        verbose_name="Кто изменил",
+        null=True,
+        blank=True
+    )
+    reason = models.TextField(blank=True, verbose_name="Причина")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+
+    class Meta:
+        verbose_name = "Смена статуса"
+        verbose_name_plural = "Журнал статусов"
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', '-created_at'], name='transition_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} #{self.object_id}: {self.from_status or '-'} → {self.to_status}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Записи журнала статусов нельзя изменять")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Записи журнала статусов нельзя удалять")
+
+
+class HelpRequestQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # Без явного using() база выбирается роутером по региону заявки, а не по модели
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
 class HelpRequest(models.Model):
     CATEGORY_CHOICES = [
         ('food', '🍎 Еда'),
@@ -111,6 +260,8 @@ class HelpRequest(models.Model):
     address = models.CharField(max_length=300, verbose_name="Адрес")
     latitude = models.FloatField(verbose_name="Широта") 
     longitude = models.FloatField(verbose_name="Долгота")
+    # Регион определяет шард; если не задан, вычисляется по координатам при создании
+    region = models.CharField(max_length=32, blank=True, db_index=True, verbose_name="Регион")
     
     # Контакты
     contact_name = models.CharField(max_length=100, verbose_name="Имя контактного лица")
@@ -129,13 +280,76 @@ class HelpRequest(models.Model):
         related_name='help_requests',
         verbose_name="Пользователь",
         null=True,
-        blank=True
+        blank=True,
+        db_constraint=False,  # заявка может лежать в шарде без таблицы пользователей
     )
     
+    # Дедупликация
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        related_name='duplicates',
+        verbose_name="Дубликат заявки",
+        null=True,
+        blank=True,
+        db_constraint=False,  # оригинал может оказаться в шарде соседнего региона
+        db_index=False,  # частичный индекс helprequest_duplicates_idx в Meta
+    )
+    # MinHash-сигнатура заголовка и описания, пересчитывается сигналом при их изменении
+    dedup_signature = models.BinaryField(blank=True, default=b'', editable=False, verbose_name="Сигнатура текста")
+
+    objects = HelpRequestQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Заявка на помощь"
         verbose_name_plural = "Заявки на помощь"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['category', 'latitude', 'longitude'], name='helprequest_dedup_idx'),
+            # Догрузка модели чтения по курсору updated_at
+            models.Index(fields=['updated_at'], name='helprequest_updated_idx'),
+            # Активные заявки. Индекс FK duplicate_of_id заменён частичным по
+            # непустым значениям: полный SQLite без ANALYZE брал под условие
+            # "duplicate_of_id IS NULL", которому отвечают почти все строки
+            models.Index(
+                fields=['duplicate_of'], condition=models.Q(duplicate_of__isnull=False),
+                name='helprequest_duplicates_idx',
+            ),
+            # Поля фильтров после created_at: count() по категории, срочности и
+            # прямоугольнику nearby читает только индекс, без обращений к таблице
+            models.Index(
+                fields=['-created_at', 'category', 'urgency', 'latitude', 'longitude'],
+                condition=models.Q(is_active=True, is_fulfilled=False, duplicate_of__isnull=True),
+                name='helprequest_active_idx',
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.title} ({self.get_category_display()})"
\ No newline at end of file
+        return f"{self.title} ({self.get_category_display()})"
+
+    def save(self, *args, **kwargs):
+        if not self.region:
+            self.region = region_for_point(self.latitude, self.longitude)
+        if self.pk is None and is_sharded():
+            # Автоинкремент у каждого шарда свой, поэтому id выдаёт общая таблица в default
+            self.pk = HelpRequestTicket.objects.create().pk
+            kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
+
+class HelpRequestTombstone(models.Model):
+    """Удалённые заявки: модели чтения других процессов убирают их по курсору deleted_at"""
+    help_request_id = models.BigIntegerField(verbose_name="ID заявки")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата удаления")
+
+    class Meta:
+        verbose_name = "Удалённая заявка"
+        verbose_name_plural = "Удалённые заявки"
+
+
+class HelpRequestTicket(models.Model):
+    """Глобально уникальные id заявок при нескольких шардах"""
+
+    class Meta:
+        verbose_name = "Номер заявки"
+        verbose_name_plural = "Номера заявок"
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Очередь модерации фондов.
+
+Фонды на проверке читаются по индексу fund_status_idx. Админ
+закрепляет за собой пачку фондов на MODERATION_LEASE_SECONDS, поэтому
+несколько админов разбирают очередь одновременно и не принимают решений по
+одним и тем же фондам. Решение по пачке и записи журнала статусов пишутся в
+одной транзакции.
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import suggest
+from .models import CharityFund, StatusTransition
+
+DECISIONS = ('approved', 'rejected')
+
+
+def lease_duration():
+    return timedelta(seconds=getattr(settings, 'MODERATION_LEASE_SECONDS', 600))
+
+
+def batch_limit():
+    return getattr(settings, 'MODERATION_BATCH_LIMIT', 100)
+
+
+def pending_funds():
+    return CharityFund.objects.filter(status='pending')
+
+
+def available_to(user, now):
+    """Фонд свободен, закреплён за этим админом или срок закрепления истёк"""
+    return Q(claimed_by__isnull=True) | Q(claimed_by=user) | Q(claim_expires_at__lt=now)
+
+
+def moderation_queue(user, now=None):
+    """Фонды на проверке, доступные админу, старые первыми"""
+    return pending_funds().filter(available_to(user, now or timezone.now())).order_by('created_at')
+
+
+def _lock(queryset):
+    # PostgreSQL пропускает строки, занятые другой транзакцией; SQLite сам сериализует запись
+    if connections[queryset.db].features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset
+
+
+def claim_funds(user, limit):
+    """Закрепить за админом до limit фондов из очереди, вернуть их queryset"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(_lock(moderation_queue(user, now)).values_list('id', flat=True)[:limit])
+        # Условие повторяется в UPDATE, чтобы не перезаписать чужое закрепление
+        pending_funds().filter(available_to(user, now), id__in=ids).update(
+            claimed_by=user, claim_expires_at=now + lease_duration(),
+        )
+    return CharityFund.objects.filter(id__in=ids, claimed_by=user).order_by('created_at')
+
+
+def release_funds(user, ids=None):
+    """Снять закрепление админа (со всех его фондов, если ids не указаны)"""
+    queryset = CharityFund.objects.filter(claimed_by=user)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    return queryset.update(claimed_by=None, claim_expires_at=None)
+
+
+def decide_funds(user, ids, status, reason=''):
+    """Одобрить или отклонить фонды, вернуть id тех, чей статус изменился.
+
+    Фонды, закреплённые за другим админом, и фонды, у которых уже этот
+    статус, пропускаются.
+    """
+    now = timezone.now()
+    reason = reason if status == 'rejected' else ''
+    fields = {'status': status, 'claimed_by': None, 'claim_expires_at': None, 'updated_at': now}
+    if status == 'approved':
+        fields['is_public'] = F('is_active')
+    else:
+        fields.update(is_public=False, rejection_reason=reason)
+
+    with transaction.atomic():
+        rows = list(_lock(
+            CharityFund.objects.filter(available_to(user, now), id__in=ids).exclude(status=status)
+        ).values_list('id', 'status'))
+        decided = [pk for pk, _ in rows]
+        CharityFund.objects.filter(id__in=decided).update(**fields)
+        StatusTransition.objects.bulk_create([
+            StatusTransition(
+                object_type='fund', object_id=pk, from_status=previous, to_status=status,
+                actor=user, reason=reason,
+            )
+            for pk, previous in rows
+        ])
+        transaction.on_commit(partial(_reindex, decided))
+    return decided
+
+
+def _reindex(ids):
+    # update() не отправляет post_save, подсказки обновляем сами
+    for pk, name, is_public in CharityFund.objects.filter(id__in=ids).values_list('id', 'name', 'is_public'):
+        suggest.fund_index.remove(pk)
+        if is_public:
+            suggest.fund_index.add(pk, name)
@@ -0,0 +1,529 @@
+"""Модель чтения активных заявок в памяти процесса.
+
+Активные заявки хранятся в колонках array (id, координаты, коды категории и
+срочности, время создания) с сеточным индексом по координатам. Поля для JSON
+лежат компактно (PayloadStore): набор значений полей с малым числом вариантов -
+номером в общей таблице, остальные - JSON-фрагментами в одном буфере без ключей,
+а объект заявки собирается при чтении. Запросы по области (nearby, тайлы) отвечаются
+без обращения к БД. Изменения приходят из сигналов после коммита, изменения
+из других процессов подтягивает фоновый поток по курсору updated_at, удаления -
+по журналу HelpRequestTombstone, а остальное (update() без updated_at) -
+периодическая полная перестройка. Тайлы точек, которые поменялись в модели
+при догрузке или перестройке, сбрасываются: иначе процесс, отстающий от
+записавшего, положил бы в общий кэш тайл по старым данным.
+
+Пока модель не построена (или активных заявок больше READ_MODEL_MAX_ROWS),
+методы запроса возвращают None и вызывающий код идёт в БД.
+"""
+import logging
+import math
+import sys
+import threading
+import time
+from array import array
+from datetime import timedelta
+from functools import lru_cache
+from json.encoder import encode_basestring
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .fast_serializers import get_field_plan
+from .models import HelpRequest, HelpRequestTombstone
+from .serializers import HelpRequestSerializer
+from .sharding import sharded
+from .visibility import active_help_requests, nearby_bounds
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = [value for value, _ in HelpRequest.CATEGORY_CHOICES]
+URGENCIES = [value for value, _ in HelpRequest.URGENCY_CHOICES]
+_CATEGORY_CODES = {value: code for code, value in enumerate(CATEGORIES)}
+_URGENCY_CODES = {value: code for code, value in enumerate(URGENCIES)}
+
+_renderer = JSONRenderer()
+
+# Поля с малым числом вариантов значения: в строке хранится номер значения
+SHARED_FIELDS = ('category', 'category_display', 'urgency', 'urgency_display',
+                 'is_active', 'is_fulfilled', 'duplicate_of', 'region')
+_SEPARATOR = b'\x00'  # в JSON не встречается: управляющие символы экранируются
+_OMITTED = b''  # поле опущено сериализатором (username заявки без пользователя)
+
+
+def is_enabled():
+    return getattr(settings, 'HELP_REQUEST_READ_MODEL', False)
+
+
+def _is_visible(row):
+    return row['is_active'] and not row['is_fulfilled'] and row['duplicate_of'] is None
+
+
+def _encode_value(value):
+    """JSON одного значения, как его выводит JSONRenderer"""
+    if value is None:
+        return b'null'
+    if value is True:
+        return b'true'
+    if value is False:
+        return b'false'
+    kind = type(value)
+    if kind is str:
+        text = encode_basestring(value)
+        if '\u2028' in text or '\u2029' in text:
+            text = text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return text.encode('utf-8')
+    if kind is int:
+        return int.__repr__(value).encode()
+    if kind is float and math.isfinite(value):
+        return float.__repr__(value).encode()
+    return _renderer.render(value)
+
+
+@lru_cache(maxsize=None)
+def _field_names():
+    return tuple(HelpRequestSerializer().fields)
+
+
+def _encode(names, data):
+    """Значения полей в порядке names, опущенные поля - пустые"""
+    return tuple(_encode_value(data[name]) if name in data else _OMITTED for name in names)
+
+
+def _load(queryset):
+    """(id, lat, lng, category, urgency, created_at, поля JSON, видима ли) для строк queryset"""
+    plan = get_field_plan(HelpRequestSerializer)
+    names = _field_names()
+    rows = list(plan.values(sharded(queryset)))
+    for row, data in zip(rows, plan.render(rows)):
+        yield (
+            row['id'], row['latitude'], row['longitude'], row['category'], row['urgency'],
+            row['created_at'].timestamp(), _encode(names, data), _is_visible(data),
+        )
+
+
+class PayloadStore:
+    """Поля JSON заявок по позициям модели.
+
+    Набор значений SHARED_FIELDS строки хранится одним номером в array('I'),
+    остальные поля - JSON-фрагментами через _SEPARATOR в одном bytearray
+    (смещение и длина строки - в array). Объект собирается шаблоном с ключами и
+    общими значениями, шаблон строится один раз на набор. Обновление дописывает
+    строку в конец буфера, буфер уплотняется, когда мусора больше половины
+    """
+
+    def __init__(self, names):
+        self.prefixes = [_encode_value(name) + b':' for name in names]
+        self.shared = [index for index, name in enumerate(names) if name in SHARED_FIELDS]
+        self.unique = [index for index, name in enumerate(names) if name not in SHARED_FIELDS]
+        self.shared_values = []
+        self.shared_codes = {}
+        self.templates = {}
+        self.codes = array('I')
+        self.buffer = bytearray()
+        self.offsets = array('Q')
+        self.lengths = array('I')
+        self.garbage = 0
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _columns(self):
+        return self.codes, self.offsets, self.lengths
+
+    def _pack(self, payload):
+        shared = tuple(payload[index] for index in self.shared)
+        code = self.shared_codes.get(shared)
+        if code is None:
+            code = self.shared_codes[shared] = len(self.shared_values)
+            self.shared_values.append(shared)
+        row = _SEPARATOR.join([payload[index] for index in self.unique])
+        offset = len(self.buffer)
+        self.buffer += row
+        return code, offset, len(row)
+
+    def append(self, payload):
+        for column, value in zip(self._columns(), self._pack(payload)):
+            column.append(value)
+
+    def __setitem__(self, position, payload):
+        self.garbage += self.lengths[position]
+        for column, value in zip(self._columns(), self._pack(payload)):
+            column[position] = value
+        self._maybe_compact()
+
+    def remove(self, position):
+        """Удалить строку, последняя переносится на её место (как в колонках модели)"""
+        self.garbage += self.lengths[position]
+        last = len(self) - 1
+        for column in self._columns():
+            column[position] = column[last]
+            column.pop()
+        self._maybe_compact()
+
+    def _row(self, position):
+        offset = self.offsets[position]
+        return self.buffer[offset:offset + self.lengths[position]].split(_SEPARATOR)
+
+    def __getitem__(self, position):
+        fields = dict(zip(self.unique, self._row(position)))
+        fields.update(zip(self.shared, self.shared_values[self.codes[position]]))
+        return tuple(bytes(fields[index]) for index in range(len(self.prefixes)))
+
+    def _template(self, code, omitted):
+        shared = dict(zip(self.shared, self.shared_values[code]))
+        parts = []
+        for index, prefix in enumerate(self.prefixes):
+            if index in shared:
+                if shared[index]:
+                    parts.append((prefix + shared[index]).replace(b'%', b'%%'))
+            elif index not in omitted:
+                parts.append(prefix.replace(b'%', b'%%') + b'%s')
+        template = self.templates[code, omitted] = b'{' + b','.join(parts) + b'}'
+        return template
+
+    def render(self, position):
+        """JSON-объект заявки, как его выводит JSONRenderer"""
+        code = self.codes[position]
+        row = self._row(position)
+        omitted = ()
+        if _OMITTED in row:
+            omitted = tuple(index for index, value in zip(self.unique, row) if not value)
+            row = [value for value in row if value]
+        template = self.templates.get((code, omitted)) or self._template(code, omitted)
+        return template % tuple(row)
+
+    def _maybe_compact(self):
+        if self.garbage * 2 <= len(self.buffer):
+            return
+        buffer = bytearray()
+        for position, offset in enumerate(self.offsets):
+            self.offsets[position] = len(buffer)
+            buffer += self.buffer[offset:offset + self.lengths[position]]
+        self.buffer = buffer
+        self.garbage = 0
+
+    def nbytes(self):
+        columns = sum(column.itemsize * len(column) for column in self._columns())
+        values = sum(sys.getsizeof(value) for values in self.shared_values for value in values)
+        templates = sum(sys.getsizeof(template) for template in self.templates.values())
+        return sys.getsizeof(self.buffer) + columns + values + templates
+
+
+class ActiveHelpRequestModel:
+    def __init__(self, cell_size, max_rows):
+        self.cell_size = cell_size
+        self.max_rows = max_rows
+        self._lock = threading.RLock()
+        self._thread = None
+        self._reset()
+        self._built_at = None
+        self._skipped_at = None  # когда модель не построена из-за лимита строк
+        self._cursor = None
+        self._memory = self._measure()
+
+    def _reset(self):
+        self.ids = array('q')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.categories = array('B')
+        self.urgencies = array('B')
+        self.created = array('d')
+        self.payloads = PayloadStore(_field_names())
+        self.positions = {}
+        self.grid = {}
+
+    @property
+    def is_ready(self):
+        return self._built_at is not None
+
+    def _available(self):
+        # Первое обращение запускает фоновую загрузку, до её окончания ответы идут из БД
+        if not is_enabled():
+            return False
+        self.start()
+        return self.is_ready
+
+    def _cell(self, latitude, longitude):
+        return int(latitude // self.cell_size), int(longitude // self.cell_size)
+
+    # Изменения
+
+    def _upsert(self, pk, latitude, longitude, category, urgency, created, payload):
+        """Добавить или обновить заявку, вернуть точки, тайлы которых изменились"""
+        position = self.positions.get(pk)
+        if position is not None:
+            old_point = (self.latitudes[position], self.longitudes[position])
+            if old_point == (latitude, longitude) and self.payloads[position] == payload:
+                return ()
+            old_cell = self._cell(*old_point)
+            self.grid[old_cell].discard(pk)
+            self.latitudes[position], self.longitudes[position] = latitude, longitude
+            self.categories[position] = _CATEGORY_CODES.get(category, 0)
+            self.urgencies[position] = _URGENCY_CODES.get(urgency, 0)
+            self.created[position] = created
+            self.payloads[position] = payload
+            changed = (old_point, (latitude, longitude))
+        else:
+            self.positions[pk] = len(self.ids)
+            self.ids.append(pk)
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+            self.categories.append(_CATEGORY_CODES.get(category, 0))
+            self.urgencies.append(_URGENCY_CODES.get(urgency, 0))
+            self.created.append(created)
+            self.payloads.append(payload)
+            changed = ((latitude, longitude),)
+        self.grid.setdefault(self._cell(latitude, longitude), set()).add(pk)
+        return changed
+
+    def _remove(self, pk):
+        position = self.positions.pop(pk, None)
+        if position is None:
+            return ()
+        point = (self.latitudes[position], self.longitudes[position])
+        cell = self._cell(*point)
+        self.grid[cell].discard(pk)
+        if not self.grid[cell]:
+            del self.grid[cell]
+        # Последний элемент переносится на место удалённого, колонки остаются плотными
+        last = len(self.ids) - 1
+        if position != last:
+            moved = self.ids[last]
+            for column in (self.ids, self.latitudes, self.longitudes, self.categories,
+                           self.urgencies, self.created):
+                column[position] = column[last]
+            self.positions[moved] = position
+        for column in (self.ids, self.latitudes, self.longitudes, self.categories,
+                       self.urgencies, self.created):
+            column.pop()
+        self.payloads.remove(position)
+        return (point,)
+
+    def _apply(self, records):
+        changed = set()
+        for pk, latitude, longitude, category, urgency, created, payload, visible in records:
+            if visible:
+                changed.update(self._upsert(pk, latitude, longitude, category, urgency, created, payload))
+            else:
+                changed.update(self._remove(pk))
+        return changed
+
+    @staticmethod
+    def _invalidate(points):
+        from . import tiles  # tiles импортирует модель чтения
+
+        for latitude, longitude in points:
+            tiles.invalidate_point(latitude, longitude)
+
+    def build(self):
+        """Полная загрузка активных заявок из БД"""
+        started_at = timezone.now()
+        total = sharded(active_help_requests()).count()
+        if total > self.max_rows:
+            if self._skipped_at is None:
+                logger.warning("Модель чтения заявок не построена: %s активных заявок, лимит %s", total, self.max_rows)
+            with self._lock:
+                self._skip()
+            return False
+        records = list(_load(active_help_requests()))
+        with self._lock:
+            previous = self.is_ready and (self.positions, self.latitudes, self.longitudes, self.payloads)
+            self._reset()
+            self._apply(records)
+            changed = set()
+            if previous:
+                # Сравнение со старым состоянием: перестройка подхватывает и то,
+                # что не видно по курсору
+                positions, latitudes, longitudes, payloads = previous
+                for pk, position in self.positions.items():
+                    point = (self.latitudes[position], self.longitudes[position])
+                    old = positions.pop(pk, None)
+                    if (old is None or (latitudes[old], longitudes[old]) != point
+                            or payloads[old] != self.payloads[position]):
+                        changed.add(point)
+                changed.update((latitudes[old], longitudes[old]) for old in positions.values())
+            self._built_at = time.monotonic()
+            self._skipped_at = None
+            self._cursor = self._next_cursor(started_at)
+            self._memory = self._measure()
+        self._invalidate(changed)
+        self._prune_tombstones()
+        return True
+
+    @staticmethod
+    def _next_cursor(started_at):
+        # updated_at ставится при save(), а строка видна после коммита: транзакция,
+        # закоммиченная после started_at, могла записать updated_at раньше него.
+        # Такие строки перечитываются с перекрытием, повторное применение ничего не меняет
+        overlap = getattr(settings, 'READ_MODEL_SYNC_OVERLAP', 60)
+        return started_at - timedelta(seconds=overlap)
+
+    def _prune_tombstones(self):
+        # Каждый процесс перестраивает модель не реже READ_MODEL_REBUILD_INTERVAL,
+        # более старые записи журнала никому не нужны
+        interval = getattr(settings, 'READ_MODEL_REBUILD_INTERVAL', 600)
+        HelpRequestTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(seconds=2 * interval)).delete()
+
+    def _skip(self):
+        # Следующая попытка - через READ_MODEL_REBUILD_INTERVAL, а не на каждом цикле
+        self._reset()
+        self._built_at = None
+        self._skipped_at = time.monotonic()
+        self._memory = self._measure()
+
+    def sync(self):
+        """Подтянуть заявки, изменённые после курсора (в том числе другими процессами)"""
+        if self._cursor is None:
+            return
+        started_at = timezone.now()
+        # Индекс helprequest_updated_idx; сортировка модели здесь не нужна
+        records = list(_load(HelpRequest.objects.filter(updated_at__gte=self._cursor).order_by()))
+        deleted = list(HelpRequestTombstone.objects.filter(deleted_at__gte=self._cursor).values_list(
+            'help_request_id', flat=True,
+        ))
+        with self._lock:
+            changed = self._apply(records)
+            for pk in deleted:
+                changed.update(self._remove(pk))
+            self._cursor = self._next_cursor(started_at)
+            if len(self.ids) > self.max_rows:
+                logger.warning("Модель чтения заявок сброшена: больше %s активных заявок", self.max_rows)
+                self._skip()
+            elif changed:
+                self._memory = self._measure()
+        self._invalidate(changed)
+
+    def refresh(self, instance):
+        """Обновить одну заявку после коммита её изменения"""
+        if not self.is_ready:
+            return
+        data = HelpRequestSerializer(instance).data
+        record = (
+            instance.pk, instance.latitude, instance.longitude, instance.category, instance.urgency,
+            instance.created_at.timestamp(), _encode(_field_names(), data), _is_visible(data),
+        )
+        with self._lock:
+            self._apply([record])
+
+    def discard(self, pk):
+        with self._lock:
+            self._remove(pk)
+
+    # Фоновое обновление
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='help-request-read-model', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        sync_interval = getattr(settings, 'READ_MODEL_SYNC_INTERVAL', 5)
+        rebuild_interval = getattr(settings, 'READ_MODEL_REBUILD_INTERVAL', 600)
+        while True:
+            try:
+                now = time.monotonic()
+                if self._built_at is None:
+                    if self._skipped_at is None or now - self._skipped_at > rebuild_interval:
+                        self.build()
+                elif now - self._built_at > rebuild_interval:
+                    self.build()
+                else:
+                    self.sync()
+            except Exception:
+                logger.exception("Ошибка обновления модели чтения заявок")
+            finally:
+                connections.close_all()
+            time.sleep(sync_interval)
+
+    # Запросы
+
+    def _positions_in(self, south, west, north, east, category=None, urgency=None):
+        category_code = _CATEGORY_CODES.get(category, -1) if category else None
+        urgency_code = _URGENCY_CODES.get(urgency, -1) if urgency else None
+        min_row, min_col = self._cell(south, west)
+        max_row, max_col = self._cell(north, east)
+        latitudes, longitudes, positions = self.latitudes, self.longitudes, self.positions
+        result = []
+        # Для большой области перебрать колонки дешевле, чем пустые ячейки сетки
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.grid):
+            candidates = range(len(self.ids))
+        else:
+            candidates = [
+                positions[pk]
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                for pk in self.grid.get((row, col), ())
+            ]
+        for position in candidates:
+            if not (south <= latitudes[position] <= north and west <= longitudes[position] <= east):
+                continue
+            if category_code is not None and self.categories[position] != category_code:
+                continue
+            if urgency_code is not None and self.urgencies[position] != urgency_code:
+                continue
+            result.append(position)
+        return result
+
+    def bbox_json(self, south, west, north, east, category=None, urgency=None):
+        """JSON-массив заявок в прямоугольнике (новые первыми) или None, если модель не готова"""
+        if not self._available():
+            return None
+        with self._lock:
+            positions = self._positions_in(south, west, north, east, category, urgency)
+            positions.sort(key=self.created.__getitem__, reverse=True)
+            render = self.payloads.render
+            return b'[' + b','.join([render(position) for position in positions]) + b']'
+
+    def nearby_json(self, lat, lng, radius, category=None, urgency=None):
+        return self.bbox_json(*nearby_bounds(lat, lng, radius), category, urgency)
+
+    def points(self, south, west, north, east):
+        """(id, lat, lng, category, urgency) для тайла, по возрастанию id, или None"""
+        if not self._available():
+            return None
+        with self._lock:
+            points = [
+                (self.ids[position], self.latitudes[position], self.longitudes[position],
+                 CATEGORIES[self.categories[position]], URGENCIES[self.urgencies[position]])
+                for position in self._positions_in(south, west, north, east)
+            ]
+        points.sort()
+        return points
+
+    def _measure(self):
+        """Размер структур в памяти; считается после build/sync, а не на каждый запрос health"""
+        columns = sum(
+            column.itemsize * len(column)
+            for column in (self.ids, self.latitudes, self.longitudes, self.categories,
+                           self.urgencies, self.created)
+        )
+        payloads = self.payloads.nbytes()
+        index = sys.getsizeof(self.positions) + sys.getsizeof(self.grid) + sum(
+            sys.getsizeof(cell) for cell in self.grid.values()
+        )
+        return {
+            'columns': columns,
+            'payloads': payloads,
+            'index': index,
+            'total': columns + payloads + index,
+        }
+
+    def stats(self):
+        return {
+            'ready': self.is_ready,
+            'rows': len(self.ids),
+            'cells': len(self.grid),
+            'memory_bytes': self._memory,
+        }
+
+
+read_model = ActiveHelpRequestModel(
+    getattr(settings, 'READ_MODEL_CELL', 0.05),
+    getattr(settings, 'READ_MODEL_MAX_ROWS', 200000),
+)
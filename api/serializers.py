@@ -1,6 +1,10 @@
 from rest_framework import serializers
-from .models import CharityFund, HelpRequest, CustomUser, Fundraiser
+from .models import CharityFund, HelpRequest, CustomUser, Fundraiser, StatusTransition
 from django.contrib.auth.password_validation import validate_password
+from .dedup import dedup_mode, find_duplicate, text_signature
+from .fast_serializers import file_url
+from .moderation import DECISIONS, batch_limit
+from .sharding import all_regions, database_for_region, region_for_point
 
 class CharityFundSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
@@ -13,6 +17,9 @@ class CharityFundSerializer(serializers.ModelSerializer):
                  'creator', 'creator_username', 'rejection_reason']
         read_only_fields = ['creator', 'status']
     
+    # Поля, которые быстрый путь списков не может вывести сам
+    fast_fields = {'image_url': (['image'], file_url)}
+    
     def get_image_url(self, obj):
         if obj.image:
             return obj.image.url
@@ -31,6 +38,14 @@ class FundraiserSerializer(serializers.ModelSerializer):
                  'image', 'image_url', 'status', 'start_date', 'end_date', 'created_at']
         read_only_fields = ['current_amount', 'progress_percentage']
     
+    fast_fields = {
+        'image_url': (['image'], file_url),
+        'progress_percentage': (
+            ['goal_amount', 'current_amount'],
+            lambda goal, current: float(Fundraiser.calculate_progress(goal, current)),
+        ),
+    }
+    
     def get_image_url(self, obj):
         if obj.image:
             return obj.image.url
@@ -47,7 +62,52 @@ class HelpRequestSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'category', 'category_display', 
                  'urgency', 'urgency_display', 'address', 'latitude', 'longitude',
                  'contact_name', 'contact_phone', 'contact_email', 
-                 'is_active', 'is_fulfilled', 'created_at', 'updated_at', 'user', 'username']
+                 'is_active', 'is_fulfilled', 'created_at', 'updated_at', 'user', 'username',
+                 'duplicate_of', 'region']
+        read_only_fields = ['duplicate_of']
+    
+    def validate_region(self, value):
+        # Регион определяет шард, поэтому задаётся только при создании
+        if self.instance is not None:
+            if value and value != self.instance.region:
+                raise serializers.ValidationError("Регион заявки нельзя изменить")
+            return self.instance.region
+        if value and value not in all_regions():
+            raise serializers.ValidationError("Неизвестный регион")
+        return value
+    
+    def validate(self, attrs):
+        # Nearby и тайлы выбирают шарды по координатам, поэтому регион всегда
+        # должен совпадать с регионом точки
+        if self.instance is not None and not {'latitude', 'longitude'} & set(attrs):
+            return attrs
+        latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+        region = region_for_point(latitude, longitude)
+        if attrs.get('region') and attrs['region'] != region and self.instance is None:
+            raise serializers.ValidationError({'region': "Регион не совпадает с координатами заявки"})
+        if self.instance is not None and region != self.instance.region:
+            if database_for_region(region) != database_for_region(self.instance.region):
+                raise serializers.ValidationError({
+                    'latitude': "Новые координаты относятся к региону из другого шарда, создайте новую заявку"
+                })
+        attrs['region'] = region
+        return attrs
+    
+    def create(self, validated_data):
+        # Проверяем заявку на дубликаты: в режиме 'merge' возвращаем существующую,
+        # в режиме 'flag' сохраняем новую со ссылкой на оригинал
+        mode = dedup_mode()
+        if mode != 'off':
+            validated_data['dedup_signature'] = text_signature(
+                validated_data.get('title', ''), validated_data.get('description', ''),
+            )
+            duplicate = find_duplicate(validated_data)
+            if duplicate is not None:
+                if mode == 'merge':
+                    return duplicate
+                validated_data['duplicate_of'] = duplicate
+        return super().create(validated_data)
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -139,4 +199,43 @@ class FundApprovalSerializer(serializers.ModelSerializer):
     """Для одобрения/отклонения фондов администратором"""
     class Meta:
         model = CharityFund
-        fields = ['id', 'status', 'rejection_reason']
\ No newline at end of file
+        fields = ['id', 'status', 'rejection_reason']
+
+
+class ModerationFundSerializer(CharityFundSerializer):
+    """Фонд в очереди модерации, с закреплением за админом"""
+    class Meta(CharityFundSerializer.Meta):
+        fields = CharityFundSerializer.Meta.fields + ['claimed_by', 'claim_expires_at']
+        read_only_fields = CharityFundSerializer.Meta.read_only_fields + ['claimed_by', 'claim_expires_at']
+
+
+class ModerationDecisionSerializer(serializers.Serializer):
+    """Пакетное одобрение/отклонение фондов"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    status = serializers.ChoiceField(choices=DECISIONS)
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate_ids(self, value):
+        if len(value) > batch_limit():
+            raise serializers.ValidationError(f"Не больше {batch_limit()} фондов за раз")
+        return value
+
+
+class ModerationReleaseSerializer(serializers.Serializer):
+    """Возврат фондов в очередь: все закреплённые или перечисленные в ids"""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class StatusTransitionFilterSerializer(serializers.Serializer):
+    """Фильтры журнала статусов из query-параметров"""
+    object_type = serializers.ChoiceField(choices=StatusTransition.OBJECT_TYPES, required=False)
+    object_id = serializers.IntegerField(min_value=0, required=False)
+
+
+class StatusTransitionSerializer(serializers.ModelSerializer):
+    actor_username = serializers.CharField(source='actor.username', read_only=True)
+
+    class Meta:
+        model = StatusTransition
+        fields = ['id', 'object_type', 'object_id', 'from_status', 'to_status',
+                  'actor', 'actor_username', 'reason', 'created_at']
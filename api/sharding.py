@@ -0,0 +1,263 @@
+"""Шардирование заявок на помощь по регионам.
+
+Регион заявки задаётся явно или определяется по координатам (прямоугольники
+из HELP_REQUEST_REGIONS), а каждый регион привязан к алиасу БД. По умолчанию
+все регионы лежат в 'default' и запросы выполняются как раньше. Если шардов
+несколько, запрос уходит только в шарды нужных регионов, выполняется в них
+параллельно, а результаты сливаются с сохранением сортировки.
+"""
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain, islice
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def regions():
+    return getattr(settings, 'HELP_REQUEST_REGIONS', {})
+
+
+def default_region():
+    return getattr(settings, 'HELP_REQUEST_DEFAULT_REGION', 'other')
+
+
+def all_regions():
+    return [*regions(), default_region()]
+
+
+def region_for_point(latitude, longitude):
+    for name, config in regions().items():
+        south, west, north, east = config['bounds']
+        if south <= latitude <= north and west <= longitude <= east:
+            return name
+    return default_region()
+
+
+def database_for_region(region):
+    return regions().get(region, {}).get('database', DEFAULT_DB_ALIAS)
+
+
+def regions_for_bbox(south, west, north, east):
+    """Регионы, пересекающие прямоугольник, плюс регион по умолчанию, если он не покрыт целиком"""
+    result, covered = [], False
+    for name, config in regions().items():
+        r_south, r_west, r_north, r_east = config['bounds']
+        if south <= r_north and north >= r_south and west <= r_east and east >= r_west:
+            result.append(name)
+            covered = covered or (r_south <= south and north <= r_north and r_west <= west and east <= r_east)
+    if not covered:
+        result.append(default_region())
+    return result
+
+
+def shards(region_names=None):
+    """{алиас БД: регионы} для списка регионов, None - все регионы"""
+    result = {}
+    for region in all_regions() if region_names is None else region_names:
+        result.setdefault(database_for_region(region), []).append(region)
+    return result
+
+
+def is_sharded():
+    return len(shards()) > 1
+
+
+def route(queryset, region_names=None, by_region=True):
+    """queryset для каждого шарда, где лежат регионы.
+
+    by_region=False - не добавлять фильтр по региону, когда строки уже
+    ограничены координатами (nearby, тайлы).
+    """
+    every_shard = shards()
+    routed = []
+    for alias, shard_regions in shards(region_names).items():
+        shard_queryset = queryset.using(alias)
+        if by_region and region_names is not None and len(every_shard[alias]) > len(shard_regions):
+            shard_queryset = shard_queryset.filter(region__in=shard_regions)
+        routed.append(shard_queryset)
+    return routed
+
+
+def sharded(queryset, region_names=None, by_region=True):
+    """Обычный queryset, если все данные в default, иначе ShardedQuerySet.
+
+    Запрос к одному шарду тоже оборачивается: в шарде нет таблиц связанных
+    моделей, и user__username читается отдельным запросом в default.
+    """
+    querysets = route(queryset, region_names, by_region)
+    if len(querysets) == 1 and querysets[0].db == DEFAULT_DB_ALIAS:
+        return querysets[0]
+    return ShardedQuerySet(querysets)
+
+
+# Параллельное выполнение
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SHARD_FANOUT_WORKERS', 8),
+                    thread_name_prefix='shard-fanout',
+                )
+    return _executor
+
+
+def _run(func):
+    try:
+        return func()
+    finally:
+        # Соединения рабочего потока не держим открытыми между запросами
+        connections.close_all()
+
+
+def fan_out(funcs):
+    """Результаты функций в том же порядке; больше одной - выполняются параллельно"""
+    if len(funcs) == 1:
+        return [funcs[0]()]
+    return list(_get_executor().map(_run, funcs))
+
+
+async def run_in_thread(func):
+    """func в потоке из пула, а не в общем потоке thread_sensitive асинхронного ORM"""
+    return await sync_to_async(_run, thread_sensitive=False)(func)
+
+
+async def afan_out(funcs):
+    return await run_in_thread(partial(fan_out, funcs))
+
+
+def _fetch(queryset, stop):
+    return list(queryset if stop is None else queryset[:stop])
+
+
+def _sort_key(ordering):
+    field = ordering.lstrip('-')
+    return field, ordering.startswith('-')
+
+
+class ShardedRows:
+    """Строки values() из нескольких шардов, слитые по полю сортировки.
+
+    Есть count() и срезы, поэтому подходит для пагинатора DRF. Поля связанных
+    моделей (user__username) читаются отдельным запросом в БД этих моделей:
+    JOIN между базами невозможен.
+    """
+
+    def __init__(self, querysets, ordering, joins=None):
+        self.querysets = querysets
+        self.field, self.reverse = _sort_key(ordering)
+        self.joins = joins or {}
+
+    def count(self):
+        return sum(fan_out([queryset.count for queryset in self.querysets]))
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start, stop = item.start or 0, item.stop
+        # Из каждого шарда достаточно первых stop строк
+        parts = fan_out([partial(_fetch, queryset, stop) for queryset in self.querysets])
+        merged = heapq.merge(*parts, key=itemgetter(self.field), reverse=self.reverse)
+        rows = list(islice(merged, start, stop))
+        self._join(rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self[:])
+
+    async def aslice(self, start=0, stop=None):
+        return await run_in_thread(partial(self.__getitem__, slice(start, stop)))
+
+    def _join(self, rows):
+        model = self.querysets[0].model
+        for relation, lookups in self.joins.items():
+            ids = {row[relation] for row in rows if row[relation] is not None}
+            if not ids:
+                for row in rows:
+                    row.update(dict.fromkeys(lookup for lookup, _ in lookups))
+                continue
+            related = model._meta.get_field(relation).related_model
+            values = {
+                item['pk']: item for item in
+                related._default_manager.filter(pk__in=ids).values('pk', *(name for _, name in lookups))
+            }
+            for row in rows:
+                item = values.get(row[relation], {})
+                for lookup, name in lookups:
+                    row[lookup] = item.get(name)
+
+
+class ShardedQuerySet:
+    """Тот же запрос в нескольких шардах: то, что нужно спискам и get_object"""
+
+    def __init__(self, querysets):
+        self.querysets = querysets
+        self.model = querysets[0].model
+
+    @property
+    def ordering(self):
+        query = self.querysets[0].query
+        ordering = query.order_by or self.model._meta.ordering or ['pk']
+        return ordering[0]
+
+    def filter(self, *args, **kwargs):
+        return ShardedQuerySet([queryset.filter(*args, **kwargs) for queryset in self.querysets])
+
+    def order_by(self, *fields):
+        return ShardedQuerySet([queryset.order_by(*fields) for queryset in self.querysets])
+
+    def values(self, *lookups):
+        local, joins = [], {}
+        for lookup in lookups:
+            relation, _, rest = lookup.partition('__')
+            if rest and self.model._meta.get_field(relation).is_relation:
+                joins.setdefault(relation, []).append((lookup, rest))
+                local.append(relation)
+            else:
+                local.append(lookup)
+        field, _ = _sort_key(self.ordering)
+        local = list(dict.fromkeys([*local, field]))
+        return ShardedRows([queryset.values(*local) for queryset in self.querysets], self.ordering, joins)
+
+    def count(self):
+        return sum(fan_out([queryset.count for queryset in self.querysets]))
+
+    async def acount(self):
+        return sum(await afan_out([queryset.count for queryset in self.querysets]))
+
+    def get(self, *args, **kwargs):
+        found = list(chain.from_iterable(fan_out([
+            partial(_fetch, queryset.filter(*args, **kwargs), 2) for queryset in self.querysets
+        ])))
+        if not found:
+            raise self.model.DoesNotExist(f'{self.model._meta.object_name} matching query does not exist.')
+        if len(found) > 1:
+            raise self.model.MultipleObjectsReturned(f'get() returned more than one {self.model._meta.object_name}')
+        return found[0]
+
+    def __iter__(self):
+        field, reverse = _sort_key(self.ordering)
+        parts = fan_out([partial(_fetch, queryset, None) for queryset in self.querysets])
+        return iter(list(heapq.merge(*parts, key=lambda obj: getattr(obj, field), reverse=reverse)))
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return list(self)[item]
+        field, reverse = _sort_key(self.ordering)
+        stop = item.stop
+        parts = fan_out([partial(_fetch, queryset, stop) for queryset in self.querysets])
+        merged = heapq.merge(*parts, key=lambda obj: getattr(obj, field), reverse=reverse)
+        return list(islice(merged, item.start or 0, stop))
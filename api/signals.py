@@ -0,0 +1,101 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import suggest, tiles
+from .dedup import text_signature
+from .read_model import is_enabled as read_model_enabled, read_model
+from .models import CharityFund, CustomUser, HelpRequest, HelpRequestTombstone
+from .sharding import shards
+
+
+def _is_visible(is_active, is_fulfilled, duplicate_of_id):
+    return is_active and not is_fulfilled and duplicate_of_id is None
+
+
+def _refresh_read_model(instance, points, deleted=False):
+    if not read_model.is_ready:
+        return
+    if deleted:
+        read_model.discard(instance.pk)
+    else:
+        read_model.refresh(instance)
+    # Тайл мог собраться из модели чтения до коммита, сбрасываем его ещё раз
+    for latitude, longitude in points:
+        tiles.invalidate_point(latitude, longitude)
+
+
+@receiver(pre_save, sender=HelpRequest)
+def remember_help_request_state(sender, instance, using, **kwargs):
+    # Старое состояние нужно, чтобы сбросить тайлы и подсказки, из которых заявка ушла
+    instance._previous_state = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_state = HelpRequest.objects.using(using).filter(pk=instance.pk).values(
+            'latitude', 'longitude', 'address', 'is_active', 'is_fulfilled', 'duplicate_of_id',
+            'title', 'description',
+        ).first()
+
+    # Сигнатура для поиска дубликатов, сериализатор мог уже посчитать её при создании
+    previous = instance._previous_state
+    if previous is None:
+        text_changed = not instance.dedup_signature
+    else:
+        text_changed = (previous['title'], previous['description']) != (instance.title, instance.description)
+    if text_changed:
+        instance.dedup_signature = text_signature(instance.title, instance.description)
+
+
+@receiver(post_save, sender=HelpRequest)
+def help_request_saved(sender, instance, using, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    points = {(instance.latitude, instance.longitude)}
+    if previous:
+        points.add((previous['latitude'], previous['longitude']))
+    for latitude, longitude in points:
+        tiles.invalidate_point(latitude, longitude)
+    transaction.on_commit(partial(_refresh_read_model, instance, points), using=using)
+
+    if previous and _is_visible(previous['is_active'], previous['is_fulfilled'], previous['duplicate_of_id']):
+        suggest.remove_address(previous['address'])
+    if _is_visible(instance.is_active, instance.is_fulfilled, instance.duplicate_of_id):
+        suggest.add_address(instance.address)
+
+
+def _record_deletion(pk):
+    # Удаление не видно по курсору updated_at, модели чтения других процессов читают журнал
+    if read_model_enabled():
+        HelpRequestTombstone.objects.create(help_request_id=pk)
+
+
+@receiver(post_delete, sender=HelpRequest)
+def help_request_deleted(sender, instance, using, **kwargs):
+    tiles.invalidate_point(instance.latitude, instance.longitude)
+    transaction.on_commit(
+        partial(_refresh_read_model, instance, [(instance.latitude, instance.longitude)], deleted=True), using=using,
+    )
+    transaction.on_commit(partial(_record_deletion, instance.pk), using=using)
+    if _is_visible(instance.is_active, instance.is_fulfilled, instance.duplicate_of_id):
+        suggest.remove_address(instance.address)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def delete_sharded_help_requests(sender, instance, using, **kwargs):
+    # Каскад Django удаляет заявки только в базе пользователя, остальные шарды чистим сами
+    for alias in shards():
+        if alias != using:
+            HelpRequest.objects.using(alias).filter(user_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=CharityFund)
+def charity_fund_saved(sender, instance, **kwargs):
+    # Переиндексируем целиком: могли смениться и название, и публичность
+    suggest.fund_index.remove(instance.pk)
+    if instance.is_public:
+        suggest.fund_index.add(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=CharityFund)
+def charity_fund_deleted(sender, instance, **kwargs):
+    suggest.fund_index.remove(instance.pk)
@@ -0,0 +1,176 @@
+"""Индекс префиксного поиска для подсказок (названия фондов, адреса заявок).
+
+Отсортированный список ключей в памяти процесса: поиск по префиксу - bisect,
+без запросов к БД. Строится лениво при первом обращении, обновляется
+сигналами моделей и периодически перестраивается в фоновом потоке, чтобы
+подхватить изменения из других процессов; пока идёт перестройка, поиск
+отвечает по старому индексу.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connections
+
+from .sharding import route
+from .visibility import active_help_requests, public_funds
+
+_SPLIT_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    return ' '.join(_SPLIT_RE.split(text.lower().replace('ё', 'е'))).strip()
+
+
+def _suffixes(normalized):
+    """Ключи с начала каждого слова, чтобы 'лен' находил 'ул ленина 1'"""
+    words = normalized.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """Ключи (суффикс, ref) в отсортированном списке, ref -> подпись в словаре"""
+
+    def __init__(self, loader, max_entries):
+        self.loader = loader
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # одна перестройка за раз
+        self._rebuilding = False
+        self._keys = []
+        self._labels = {}
+        self._counts = {}
+        self._built_at = None
+
+    def _rebuild_interval(self):
+        return getattr(settings, 'SUGGEST_REBUILD_INTERVAL', 300)
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        keys, labels, counts = [], {}, {}
+        for ref, label in self.loader():
+            if ref in counts:
+                counts[ref] += 1
+                continue
+            ref_keys = _suffixes(normalize(label))
+            if len(keys) + len(ref_keys) > self.max_entries:
+                break
+            counts[ref] = 1
+            labels[ref] = label
+            keys.extend((key, ref) for key in ref_keys)
+        keys.sort()
+        with self._lock:
+            self._keys, self._labels, self._counts = keys, labels, counts
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        if self._built_at is None:
+            # Первое построение синхронно, параллельные запросы ждут его, а не строят своё
+            with self._build_lock:
+                if self._built_at is None:
+                    self._build()
+        elif time.monotonic() - self._built_at > self._rebuild_interval():
+            self._rebuild_in_background()
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name='suggest-index-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self.build()
+        finally:
+            self._rebuilding = False
+            # Соединение фонового потока не держим открытым
+            connections.close_all()
+
+    def add(self, ref, label):
+        with self._lock:
+            if not self.is_built:
+                return  # появится при построении
+            if ref in self._counts:
+                self._counts[ref] += 1
+                return
+            ref_keys = _suffixes(normalize(label))
+            if len(self._keys) + len(ref_keys) > self.max_entries:
+                return
+            self._counts[ref] = 1
+            self._labels[ref] = label
+            for key in ref_keys:
+                insort(self._keys, (key, ref))
+
+    def remove(self, ref):
+        with self._lock:
+            if not self.is_built or ref not in self._counts:
+                return
+            self._counts[ref] -= 1
+            if self._counts[ref] > 0:
+                return
+            del self._counts[ref]
+            label = self._labels.pop(ref)
+            for key in _suffixes(normalize(label)):
+                i = bisect_left(self._keys, (key, ref))
+                if i < len(self._keys) and self._keys[i] == (key, ref):
+                    del self._keys[i]
+
+    def search(self, query, limit=10):
+        """До limit пар (ref, подпись), у которых слово начинается с query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self._ensure_built()
+        with self._lock:
+            result, seen = [], set()
+            i = bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and len(result) < limit:
+                key, ref = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                if ref not in seen:
+                    seen.add(ref)
+                    result.append((ref, self._labels[ref]))
+                i += 1
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._keys), 'items': len(self._labels)}
+
+
+def _load_funds():
+    for pk, name in public_funds().values_list('id', 'name').iterator():
+        yield pk, name
+
+
+def _load_addresses():
+    for queryset in route(active_help_requests().values_list('address')):
+        for (address,) in queryset.iterator():
+            yield normalize(address), address
+
+
+def _max_entries():
+    return getattr(settings, 'SUGGEST_MAX_ENTRIES', 100000)
+
+
+fund_index = PrefixIndex(_load_funds, _max_entries())
+address_index = PrefixIndex(_load_addresses, _max_entries())
+
+
+def add_address(address):
+    address_index.add(normalize(address), address)
+
+
+def remove_address(address):
+    address_index.remove(normalize(address))
@@ -1,3 +1,702 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from .models import CharityFund, CustomUser, HelpRequest, HelpRequestTicket, StatusTransition
+from . import tiles
+from .dedup import band_keys, iter_duplicates, minhash, similarity
+from .read_model import ActiveHelpRequestModel, read_model
+from .serializers import HelpRequestSerializer
+from .suggest import PrefixIndex
+from .sharding import ShardedQuerySet, is_sharded, route, sharded, shards
+from .visibility import active_help_requests, sharded_nearby_help_requests
+
+
+class HelpRequestFactoryMixin:
+    """Создание заявок; self.user и self.now задаются в setUp"""
+
+    def create_request(self, point, minutes_ago=0, **fields):
+        fields = {
+            'title': 'Заявка', 'description': 'Описание', 'category': 'food', 'address': 'Адрес',
+            'contact_name': 'Имя', 'contact_phone': '123', 'user': self.user, **fields,
+        }
+        help_request = HelpRequest.objects.create(latitude=point[0], longitude=point[1], **fields)
+        # created_at задаётся явно, чтобы порядок не зависел от скорости создания
+        created_at = self.now - timedelta(minutes=minutes_ago)
+        HelpRequest.objects.using(help_request._state.db).filter(pk=help_request.pk).update(created_at=created_at)
+        help_request.created_at = created_at
+        return help_request
+
+
+def use_temporary_tile_cache(test):
+    """Тайлы теста - во временном каталоге (или очищенном кэше 'tiles'), а не в общем TILE_CACHE_DIR"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    override = override_settings(TILE_CACHE_DIR=directory.name)
+    override.enable()
+    test.addCleanup(override.disable)
+    if 'tiles' in settings.CACHES:
+        tiles.tile_cache().clear()
+
+
+class ModerationQueueTests(APITestCase):
+    """Закрепление фондов за админами, пакетные решения и журнал статусов"""
+
+    def setUp(self):
+        self.first = CustomUser.objects.create_user('first', 'first@example.com', 'password', role='admin')
+        self.second = CustomUser.objects.create_user('second', 'second@example.com', 'password', role='admin')
+        self.creator = CustomUser.objects.create_user('creator', 'creator@example.com', 'password', role='fund_creator')
+        self.funds = [
+            CharityFund.objects.create(name=f'Фонд {i}', description='Описание', creator=self.creator)
+            for i in range(3)
+        ]
+
+    def claim(self, user, limit):
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('admin-moderation-claim'), {'limit': limit}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [fund['id'] for fund in response.json()]
+
+    def decide(self, user, ids, status, reason=''):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            reverse('admin-moderation-decide'), {'ids': ids, 'status': status, 'reason': reason}, format='json',
+        )
+
+    def test_claims_of_two_moderators_do_not_overlap(self):
+        first_ids = self.claim(self.first, 2)
+        second_ids = self.claim(self.second, 10)
+
+        self.assertEqual(first_ids, [fund.pk for fund in self.funds[:2]])
+        self.assertEqual(second_ids, [self.funds[2].pk])
+        self.assertEqual(self.claim(self.second, 10), second_ids)
+
+        response = self.client.get(reverse('admin-moderation'))
+        self.assertEqual([fund['id'] for fund in response.json()['results']], second_ids)
+
+    def test_expired_lease_returns_fund_to_queue(self):
+        claimed = self.claim(self.first, 3)
+        CharityFund.objects.filter(id__in=claimed[:1]).update(claim_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.claim(self.second, 10), claimed[:1])
+        self.assertEqual(CharityFund.objects.get(pk=claimed[0]).claimed_by, self.second)
+
+    def test_release_ignores_foreign_claims(self):
+        claimed = self.claim(self.first, 3)
+
+        self.client.force_authenticate(self.second)
+        response = self.client.post(reverse('admin-moderation-release'), {'ids': claimed}, format='json')
+        self.assertEqual(response.json(), {'released': 0})
+        self.assertEqual(CharityFund.objects.filter(claimed_by=self.first).count(), 3)
+
+        self.client.force_authenticate(self.first)
+        response = self.client.post(reverse('admin-moderation-release'), {'ids': claimed[:2]}, format='json')
+        self.assertEqual(response.json(), {'released': 2})
+        response = self.client.post(reverse('admin-moderation-release'), {}, format='json')
+        self.assertEqual(response.json(), {'released': 1})
+        self.assertFalse(CharityFund.objects.filter(claimed_by__isnull=False).exists())
+
+    def test_decide_unclaimed_funds(self):
+        ids = [fund.pk for fund in self.funds]
+        response = self.decide(self.first, ids, 'approved')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()['decided']), ids)
+        self.assertEqual(response.json()['skipped'], [])
+        self.assertEqual(CharityFund.objects.filter(status='approved', is_public=True).count(), 3)
+
+        # Повторное решение с тем же статусом ничего не меняет
+        self.assertEqual(self.decide(self.first, ids, 'approved').json()['skipped'], ids)
+
+    def test_decide_skips_funds_claimed_by_another_moderator(self):
+        claimed = self.claim(self.first, 1)
+        ids = [fund.pk for fund in self.funds]
+
+        response = self.decide(self.second, ids, 'rejected', 'Нет документов')
+
+        self.assertEqual(response.json()['skipped'], claimed)
+        self.assertEqual(CharityFund.objects.get(pk=claimed[0]).status, 'pending')
+        self.assertEqual(
+            CharityFund.objects.filter(status='rejected', rejection_reason='Нет документов').count(), 2,
+        )
+
+    def test_single_approve_conflicts_with_foreign_claim(self):
+        claimed = self.claim(self.first, 1)
+
+        self.client.force_authenticate(self.second)
+        response = self.client.post(reverse('fund-approve', args=[claimed[0]]))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(CharityFund.objects.get(pk=claimed[0]).status, 'pending')
+
+    def test_transitions_record_actor_and_reason(self):
+        fund = self.funds[0]
+        creation = StatusTransition.objects.get(object_type='fund', object_id=fund.pk)
+        self.assertEqual((creation.from_status, creation.to_status, creation.actor), ('', 'pending', self.creator))
+
+        self.decide(self.first, [fund.pk], 'rejected', 'Нет документов')
+        self.decide(self.second, [fund.pk], 'approved', 'Причина одобрения не хранится')
+
+        self.client.force_authenticate(self.first)
+        response = self.client.get(reverse('admin-transitions'), {'object_type': 'fund', 'object_id': fund.pk})
+        rows = [
+            (row['from_status'], row['to_status'], row['actor_username'], row['reason'])
+            for row in response.json()['results']
+        ]
+        self.assertEqual(rows, [
+            ('rejected', 'approved', 'second', ''),
+            ('pending', 'rejected', 'first', 'Нет документов'),
+            ('', 'pending', 'creator', ''),
+        ])
+
+    def test_transitions_are_append_only(self):
+        transition = StatusTransition.objects.first()
+        with self.assertRaises(ValueError):
+            transition.save()
+        with self.assertRaises(ValueError):
+            transition.delete()
+
+    def test_invalid_input_returns_400(self):
+        self.client.force_authenticate(self.first)
+        self.assertEqual(self.client.get(reverse('admin-transitions'), {'object_id': 'abc'}).status_code, 400)
+        response = self.client.post(reverse('admin-moderation-release'), {'ids': ['abc']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.decide(self.first, [self.funds[0].pk], 'deleted').status_code, 400)
+
+
+@skipUnless(is_sharded(), "нужен второй шард: manage.py test --settings charity_platform.settings_test")
+class ShardingTests(HelpRequestFactoryMixin, APITransactionTestCase):
+    """Заявки Москвы в шарде shard_moscow, остальные регионы в default"""
+    databases = {'default', *shards()}
+
+    MOSCOW = (55.75, 37.61)
+    SPB = (59.93, 30.31)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('author', 'author@example.com', 'password')
+        self.now = timezone.now()
+
+    def create_mixed(self, total):
+        return [self.create_request(self.MOSCOW if i % 2 else self.SPB, minutes_ago=i) for i in range(total)]
+
+    def test_requests_are_routed_by_region(self):
+        moscow = self.create_request(self.MOSCOW)
+        spb = self.create_request(self.SPB)
+
+        self.assertEqual((moscow.region, moscow._state.db), ('moscow', 'shard_moscow'))
+        self.assertEqual((spb.region, spb._state.db), ('spb', 'default'))
+        self.assertTrue(HelpRequest.objects.using('shard_moscow').filter(pk=moscow.pk).exists())
+        self.assertFalse(HelpRequest.objects.using('default').filter(pk=moscow.pk).exists())
+
+    def test_ticket_ids_are_unique_across_shards(self):
+        ids = [help_request.pk for help_request in self.create_mixed(6)]
+
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(HelpRequestTicket.objects.filter(pk__in=ids).count(), 6)
+
+    def test_sharded_queryset_merges_count_and_slices(self):
+        expected = [help_request.pk for help_request in self.create_mixed(12)]
+        queryset = sharded(HelpRequest.objects.all())
+
+        self.assertIsInstance(queryset, ShardedQuerySet)
+        self.assertEqual(queryset.count(), 12)
+        self.assertEqual([help_request.pk for help_request in queryset], expected)
+        self.assertEqual([help_request.pk for help_request in queryset[3:8]], expected[3:8])
+
+        rows = queryset.values('id', 'user__username')[5:9]
+        self.assertEqual([row['id'] for row in rows], expected[5:9])
+        self.assertEqual({row['user__username'] for row in rows}, {'author'})
+        self.assertEqual(queryset.get(pk=expected[1]).region, 'moscow')
+
+    def test_list_is_ordered_and_paginated_across_shards(self):
+        expected = [help_request.pk for help_request in self.create_mixed(25)]
+
+        first = self.client.get(reverse('helprequest-list')).json()
+        second = self.client.get(reverse('helprequest-list'), {'page': 2}).json()
+
+        self.assertEqual(first['count'], 25)
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], expected)
+        self.assertIsNone(second['next'])
+
+        async_second = self.client.get(reverse('async-help-requests'), {'page': 2}).json()
+        self.assertEqual(async_second['results'], second['results'])
+
+    def test_list_filtered_by_region(self):
+        self.create_mixed(6)
+
+        response = self.client.get(reverse('helprequest-list'), {'region': 'moscow'}).json()
+
+        self.assertEqual(response['count'], 3)
+        self.assertEqual({row['region'] for row in response['results']}, {'moscow'})
+        # Пользователи лежат в default, а не в шарде
+        self.assertEqual({row['username'] for row in response['results']}, {'author'})
+
+    def test_nearby_at_region_border_reads_both_shards(self):
+        # Южная граница Москвы - 54.8: одна заявка в шарде, другая в default
+        inside = self.create_request((54.81, 37.6), minutes_ago=1)
+        outside = self.create_request((54.79, 37.6), minutes_ago=2)
+        self.create_request(self.SPB)
+
+        response = self.client.get(reverse('helprequest-nearby'), {'lat': 54.8, 'lng': 37.6, 'radius': 1})
+
+        self.assertEqual(inside._state.db, 'shard_moscow')
+        self.assertEqual(outside._state.db, 'default')
+        self.assertEqual([row['id'] for row in response.json()], [inside.pk, outside.pk])
+
+    def test_detail_update_and_delete_in_shard(self):
+        help_request = self.create_request(self.MOSCOW)
+        url = reverse('helprequest-detail', args=[help_request.pk])
+        self.client.force_authenticate(self.user)
+
+        self.assertEqual(self.client.get(url).json()['region'], 'moscow')
+        self.assertEqual(self.client.patch(url, {'title': 'Новая'}, format='json').status_code, 200)
+        self.assertEqual(HelpRequest.objects.using('shard_moscow').get(pk=help_request.pk).title, 'Новая')
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(HelpRequest.objects.using('shard_moscow').exists())
+
+    def test_region_must_match_coordinates(self):
+        self.client.force_authenticate(self.user)
+        data = {
+            'title': 'Заявка', 'description': 'Описание', 'category': 'food', 'address': 'Адрес',
+            'latitude': self.MOSCOW[0], 'longitude': self.MOSCOW[1], 'contact_name': 'Имя', 'contact_phone': '123',
+        }
+
+        response = self.client.post(reverse('helprequest-list'), {**data, 'region': 'spb'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        spb = self.create_request(self.SPB)
+        response = self.client.patch(
+            reverse('helprequest-detail', args=[spb.pk]),
+            {'latitude': self.MOSCOW[0], 'longitude': self.MOSCOW[1]}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(HelpRequest.objects.get(pk=spb.pk).region, 'spb')
+
+
+@override_settings(HELP_REQUEST_READ_MODEL=True)
+class ReadModelTests(HelpRequestFactoryMixin, APITransactionTestCase):
+    """Модель чтения отвечает так же, как запросы к БД"""
+    databases = {'default', *shards()}
+
+    CENTER = (55.75, 37.61)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('author', 'author@example.com', 'password')
+        self.now = timezone.now()
+        # Фоновый поток не запускаем: build() и sync() вызываются в тесте
+        read_model._thread = threading.current_thread()
+        self.addCleanup(self.reset_read_model)
+        use_temporary_tile_cache(self)
+        self.requests = [
+            self.create_request((55.75, 37.61), category='food', urgency='high', minutes_ago=1),
+            self.create_request((55.76, 37.60), category='medicine', urgency='high', minutes_ago=2),
+            self.create_request((55.70, 37.55), category='food', urgency='low', minutes_ago=3),
+            self.create_request((55.80, 37.70), category='clothes', urgency='critical', minutes_ago=4),
+            self.create_request((55.74, 37.62), category='food', urgency='high', minutes_ago=5, is_fulfilled=True),
+            self.create_request((59.93, 30.31), category='food', urgency='high', minutes_ago=6),
+        ]
+
+    def reset_read_model(self):
+        with read_model._lock:
+            read_model._reset()
+            read_model._built_at = read_model._skipped_at = read_model._cursor = None
+            read_model._thread = None
+
+    def orm_nearby(self, lat, lng, radius, category=None, urgency=None):
+        rows = HelpRequestSerializer(
+            list(sharded_nearby_help_requests(lat, lng, radius, category, urgency)), many=True,
+        ).data
+        return json.loads(JSONRenderer().render(rows))
+
+    def orm_points(self, south, west, north, east):
+        queryset = active_help_requests().filter(latitude__range=(south, north), longitude__range=(west, east))
+        return sorted(
+            point for shard in route(queryset.values_list('id', 'latitude', 'longitude', 'category', 'urgency'))
+            for point in shard
+        )
+
+    def assert_equivalent(self):
+        for radius, category, urgency in [(10, None, None), (3, None, None), (10, 'food', None),
+                                          (10, None, 'high'), (10, 'food', 'high'), (1000, None, None)]:
+            with self.subTest(radius=radius, category=category, urgency=urgency):
+                body = read_model.nearby_json(*self.CENTER, radius, category, urgency)
+                self.assertIsNotNone(body)
+                self.assertEqual(json.loads(body), self.orm_nearby(*self.CENTER, radius, category, urgency))
+        bbox = (55.0, 37.0, 56.0, 38.0)
+        self.assertEqual(read_model.points(*bbox), self.orm_points(*bbox))
+
+    def test_cold_model_falls_back_to_database(self):
+        self.assertIsNone(read_model.nearby_json(*self.CENTER, 10))
+        response = self.client.get(reverse('helprequest-nearby'), {'lat': self.CENTER[0], 'lng': self.CENTER[1]})
+        self.assertEqual(response.json(), self.orm_nearby(*self.CENTER, 10))
+
+    def test_built_model_matches_database(self):
+        self.assertTrue(read_model.build())
+        self.assert_equivalent()
+
+        response = self.client.get(reverse('helprequest-nearby'), {'lat': self.CENTER[0], 'lng': self.CENTER[1]})
+        self.assertEqual(response.json(), self.orm_nearby(*self.CENTER, 10))
+
+    def test_changes_are_applied_after_sync(self):
+        self.assertTrue(read_model.build())
+        created = self.create_request((55.751, 37.611), category='household', urgency='medium')
+        moved, fulfilled, deleted = self.requests[1], self.requests[2], self.requests[3]
+
+        moved.title, moved.latitude, moved.longitude = 'Перенесена', 55.72, 37.58
+        moved.save()
+        deleted.delete()
+        # update() не отправляет сигналов, такое изменение подтягивает только sync()
+        HelpRequest.objects.using(fulfilled._state.db).filter(pk=fulfilled.pk).update(
+            is_fulfilled=True, updated_at=timezone.now(),
+        )
+        read_model.sync()
+
+        ids = {row['id'] for row in json.loads(read_model.nearby_json(*self.CENTER, 10))}
+        self.assertIn(created.pk, ids)
+        self.assertNotIn(fulfilled.pk, ids)
+        self.assertNotIn(deleted.pk, ids)
+        self.assert_equivalent()
+
+    def test_sync_applies_other_process_changes_and_drops_their_tiles(self):
+        # Модель другого процесса: сигналы этого процесса её не обновляют
+        other = ActiveHelpRequestModel(read_model.cell_size, read_model.max_rows)
+        self.assertTrue(other.build())
+        moved, deleted = self.requests[1], self.requests[2]
+        old_point = (moved.latitude, moved.longitude)
+
+        moved.latitude, moved.longitude = 55.72, 37.58
+        moved.save()
+        deleted.delete()
+        # Отстающий процесс успел положить в общий кэш тайлы по старым данным
+        stale = [
+            tiles.cache_key(*tile) for point in (old_point, (deleted.latitude, deleted.longitude))
+            for tile in tiles.tiles_for_point(point[1], point[0], zooms=[12])
+        ]
+        tiles.tile_cache().set_many(dict.fromkeys(stale, b'stale'), tiles.cache_timeout())
+
+        other.sync()
+
+        self.assertNotIn(deleted.pk, other.positions)
+        position = other.positions[moved.pk]
+        self.assertEqual((other.latitudes[position], other.longitudes[position]), (55.72, 37.58))
+        self.assertEqual(tiles.tile_cache().get_many(stale), {})
+
+    def test_sync_rereads_rows_committed_behind_cursor(self):
+        other = ActiveHelpRequestModel(read_model.cell_size, read_model.max_rows)
+        self.assertTrue(other.build())
+        # Транзакция записала updated_at до начала build, а закоммитилась после него
+        late = self.requests[0]
+        HelpRequest.objects.using(late._state.db).filter(pk=late.pk).update(
+            title='Поздний коммит', updated_at=timezone.now() - timedelta(seconds=5),
+        )
+
+        other.sync()
+
+        payload = json.loads(other.payloads.render(other.positions[late.pk]))
+        self.assertEqual(payload['title'], 'Поздний коммит')
+
+    def test_payloads_render_like_json_renderer(self):
+        self.create_request(self.CENTER, category='food', urgency='low', title='Скидка 50% "сразу"\u2028', user=None)
+        self.assertTrue(read_model.build())
+        edited, removed = self.requests[0], self.requests[1]
+        edited.description = 'Новое описание'
+        edited.save()
+        removed.delete()
+
+        expected = {
+            help_request.pk: JSONRenderer().render(HelpRequestSerializer(help_request).data)
+            for help_request in sharded(active_help_requests())
+        }
+        rendered = {pk: read_model.payloads.render(position) for pk, position in read_model.positions.items()}
+        self.assertEqual(rendered, expected)
+
+    def test_model_is_not_built_above_row_limit(self):
+        max_rows = read_model.max_rows
+        self.addCleanup(setattr, read_model, 'max_rows', max_rows)
+        read_model.max_rows = 2
+
+        self.assertFalse(read_model.build())
+        self.assertIsNone(read_model.nearby_json(*self.CENTER, 10))
+        self.assertFalse(read_model.stats()['ready'])
+
+
+class DedupTests(HelpRequestFactoryMixin, APITransactionTestCase):
+    """MinHash-дедупликация заявок при создании и командой dedupe_help_requests"""
+    databases = {'default', *shards()}
+
+    POINT = (55.75, 37.61)
+    TITLE = 'Нужны продукты для пожилой соседки'
+    DESCRIPTION = 'Соседке 80 лет, нужны крупы, молоко и хлеб на неделю'
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('author', 'author@example.com', 'password')
+        self.now = timezone.now()
+
+    def post_request(self, point, description=DESCRIPTION):
+        return self.client.post(reverse('helprequest-list'), {
+            'title': self.TITLE, 'description': description, 'category': 'food', 'urgency': 'high',
+            'address': 'Адрес', 'latitude': point[0], 'longitude': point[1],
+            'contact_name': 'Имя', 'contact_phone': '123',
+        }, format='json')
+
+    def test_minhash_matches_similar_texts_only(self):
+        original = minhash(self.TITLE, self.DESCRIPTION)
+        edited = minhash(self.TITLE, 'Соседке 80 лет, нужны крупы, молоко и хлеб на две недели')
+        other = minhash('Ищем волонтёров на субботник', 'Уборка парка в субботу, инвентарь выдадим')
+
+        self.assertGreaterEqual(similarity(original, edited), 0.7)
+        self.assertLess(similarity(original, other), 0.7)
+        # LSH: похожие сигнатуры попадают хотя бы в одну общую полосу
+        self.assertTrue(set(band_keys(original)) & set(band_keys(edited)))
+        self.assertFalse(set(band_keys(original)) & set(band_keys(other)))
+
+    def test_iter_duplicates_pairs_same_category_nearby_within_window(self):
+        def row(pk, days_ago, category='food', point=self.POINT, title=self.TITLE):
+            return {
+                'id': pk, 'title': title, 'description': self.DESCRIPTION, 'category': category,
+                'latitude': point[0], 'longitude': point[1], 'created_at': self.now - timedelta(days=days_ago),
+            }
+
+        rows = [
+            row(1, 30),
+            row(2, 10),  # вне окна от 1, становится оригиналом
+            row(3, 9),
+            row(4, 8, category='medicine'),
+            row(5, 7, point=(55.80, 37.61)),
+            row(6, 6, title='Ищем волонтёров на субботник'),
+        ]
+
+        self.assertEqual(list(iter_duplicates(rows, window=timedelta(days=14))), [(3, 2)])
+
+    def test_flag_mode_saves_duplicate_with_link(self):
+        original = self.create_request(self.POINT, title=self.TITLE, description=self.DESCRIPTION)
+
+        response = self.post_request((55.7501, 37.6101))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.json()['id'], original.pk)
+        self.assertEqual(response.json()['duplicate_of'], original.pk)
+        self.assertEqual(self.post_request((55.90, 37.61)).json()['duplicate_of'], None)
+
+    @override_settings(HELP_REQUEST_DEDUP_MODE='merge')
+    def test_merge_mode_returns_existing_request(self):
+        original = self.create_request(self.POINT, title=self.TITLE, description=self.DESCRIPTION)
+
+        response = self.post_request((55.7501, 37.6101))
+
+        self.assertEqual(response.json()['id'], original.pk)
+        self.assertEqual(sharded(HelpRequest.objects.all()).count(), 1)
+
+    def test_command_merges_duplicates_without_stored_signature(self):
+        original = self.create_request(self.POINT, minutes_ago=2, title=self.TITLE, description=self.DESCRIPTION)
+        duplicate = self.create_request(self.POINT, minutes_ago=1, title=self.TITLE, description=self.DESCRIPTION)
+        other = self.create_request(self.POINT, title='Ищем волонтёров на субботник')
+        # Импорт через bulk_create: сигнатуры нет, команда считает её по тексту
+        HelpRequest.objects.using(duplicate._state.db).filter(pk=duplicate.pk).update(dedup_signature=b'')
+
+        call_command('dedupe_help_requests', '--dry-run', stdout=StringIO())
+        self.assertIsNone(HelpRequest.objects.using(duplicate._state.db).get(pk=duplicate.pk).duplicate_of_id)
+
+        call_command('dedupe_help_requests', '--merge', stdout=StringIO())
+        merged = HelpRequest.objects.using(duplicate._state.db).get(pk=duplicate.pk)
+        self.assertEqual((merged.duplicate_of_id, merged.is_active), (original.pk, False))
+        # updated_at сдвинут: модели чтения увидят изменение по курсору
+        self.assertGreater(merged.updated_at, duplicate.updated_at)
+        self.assertTrue(HelpRequest.objects.using(other._state.db).get(pk=other.pk).is_active)
+
+
+def _protobuf_fields(data):
+    """(номер поля, значение) сообщения protobuf: varint или bytes"""
+    position = 0
+    while position < len(data):
+        key, position = _read_varint(data, position)
+        if key & 7 == 0:
+            value, position = _read_varint(data, position)
+        else:
+            length, position = _read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        yield key >> 3, value
+
+
+def _read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _packed(data):
+    position, values = 0, []
+    while position < len(data):
+        value, position = _read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def decode_tile(tile):
+    """{id: (x, y, {ключ: значение})} для точек слоя help_requests"""
+    features = {}
+    for _, layer in _protobuf_fields(tile):
+        fields = list(_protobuf_fields(layer))
+        keys = [value.decode() for field, value in fields if field == 3]
+        values = [dict(_protobuf_fields(value))[1].decode() for field, value in fields if field == 4]
+        for field, feature in fields:
+            if field != 2:
+                continue
+            feature = dict(_protobuf_fields(feature))
+            tags = _packed(feature[2])
+            _, x, y = _packed(feature[4])
+            features[feature[1]] = (
+                (x >> 1) ^ -(x & 1), (y >> 1) ^ -(y & 1),
+                {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)},
+            )
+    return features
+
+
+class TileTests(HelpRequestFactoryMixin, APITransactionTestCase):
+    """Векторные тайлы: кодирование, кэш и сброс по изменению заявки"""
+    databases = {'default', *shards()}
+
+    ZOOM = 12
+    POINT = (55.75, 37.61)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('author', 'author@example.com', 'password')
+        self.now = timezone.now()
+        use_temporary_tile_cache(self)
+
+    def tile_for(self, point):
+        x, y = tiles.lnglat_to_world(point[1], point[0], self.ZOOM)
+        return self.ZOOM, int(x), int(y)
+
+    def get_tile(self, tile):
+        response = self.client.get(reverse('help-request-tile', args=tile))
+        self.assertEqual(response.status_code, 200)
+        return decode_tile(response.content)
+
+    def test_encode_tile_places_points_in_tile_coordinates(self):
+        z, x, y = self.tile_for(self.POINT)
+        west, north = tiles.world_to_lnglat(x, y, z)
+        center = tiles.world_to_lnglat(x + 0.5, y + 0.5, z)
+
+        features = decode_tile(tiles.encode_tile([
+            (1, north, west, 'food', 'high'),
+            (2, center[1], center[0], 'medicine', 'low'),
+        ], z, x, y))
+
+        self.assertEqual(tiles.encode_tile([], z, x, y), b'')
+        self.assertEqual(features[1], (0, 0, {'category': 'food', 'urgency': 'high'}))
+        self.assertEqual(features[2][:2], (tiles.EXTENT // 2, tiles.EXTENT // 2))
+        self.assertEqual(features[2][2], {'category': 'medicine', 'urgency': 'low'})
+
+    def test_tiles_for_point_includes_neighbours_within_buffer(self):
+        z, x, y = self.tile_for(self.POINT)
+        center = tiles.world_to_lnglat(x + 0.5, y + 0.5, z)
+        west_edge = tiles.world_to_lnglat(x, y + 0.5, z)
+        corner = tiles.world_to_lnglat(x, y, z)
+
+        self.assertEqual(tiles.tiles_for_point(*center, zooms=[z]), [(z, x, y)])
+        self.assertEqual(sorted(tiles.tiles_for_point(*west_edge, zooms=[z])), [(z, x - 1, y), (z, x, y)])
+        self.assertEqual(len(tiles.tiles_for_point(*corner, zooms=[z])), 4)
+
+    def test_tile_cache_is_invalidated_when_request_moves(self):
+        help_request = self.create_request(self.POINT, category='food', urgency='high')
+        old_tile = self.tile_for(self.POINT)
+        self.assertIn(help_request.pk, self.get_tile(old_tile))
+        self.assertIsNotNone(tiles.tile_cache().get(tiles.cache_key(*old_tile)))
+
+        help_request.latitude, help_request.longitude = 55.60, 37.40
+        help_request.save()
+
+        self.assertIsNone(tiles.tile_cache().get(tiles.cache_key(*old_tile)))
+        self.assertNotIn(help_request.pk, self.get_tile(old_tile))
+        self.assertIn(help_request.pk, self.get_tile(self.tile_for((55.60, 37.40))))
+
+    def test_file_store_expires_replaces_and_deletes(self):
+        store = tiles.TileFileStore(settings.TILE_CACHE_DIR)
+        key, expired = tiles.cache_key(12, 1, 2), tiles.cache_key(12, 1, 3)
+
+        store.set(key, b'old', 60)
+        store.set(key, b'', 60)
+        store.set(expired, b'tile', -1)
+
+        self.assertEqual(store.get_many([key, expired]), {key: b''})
+        self.assertEqual(os.listdir(os.path.dirname(store.path(key))), ['2.mvt', '3.mvt'])
+        store.delete_many([key, expired, tiles.cache_key(12, 1, 4)])
+        self.assertIsNone(store.get(key))
+
+
+class PrefixIndexTests(SimpleTestCase):
+    """Префиксный поиск подсказок, обновление сигналами и перестройка в фоне"""
+
+    ADDRESSES = ['ул. Ленина, 1', 'Ленинградский пр., 5', 'ул. Мира, 3', 'Ёлочная ул., 7']
+
+    def make_index(self, labels=ADDRESSES, max_entries=100):
+        return PrefixIndex(lambda: [(label.lower(), label) for label in labels], max_entries)
+
+    def test_search_matches_word_prefixes(self):
+        index = self.make_index()
+
+        self.assertEqual([label for _, label in index.search('лен')], ['ул. Ленина, 1', 'Ленинградский пр., 5'])
+        # Порядок - по ключу: 'ул 7' из 'елочная ул 7' раньше 'ул ленина 1'
+        self.assertEqual([label for _, label in index.search('ул')], ['Ёлочная ул., 7', 'ул. Ленина, 1', 'ул. Мира, 3'])
+        self.assertEqual(index.search('ЕЛОЧ'), [('ёлочная ул., 7', 'Ёлочная ул., 7')])
+        self.assertEqual(len(index.search('ул', limit=2)), 2)
+        self.assertEqual(index.search('  '), [])
+
+    def test_add_and_remove_count_references(self):
+        index = self.make_index([])
+        index.add('x', 'Садовая, 1')  # индекс ещё не построен, запись появится при построении
+        self.assertEqual(index.search('сад'), [])
+
+        index.add('x', 'Садовая, 1')
+        index.add('x', 'Садовая, 1')
+        index.remove('x')
+        self.assertEqual(index.search('сад'), [('x', 'Садовая, 1')])
+        index.remove('x')
+        self.assertEqual(index.search('сад'), [])
+        self.assertEqual(index.stats(), {'entries': 0, 'items': 0})
+
+    def test_entries_are_limited(self):
+        index = self.make_index(max_entries=3)
+
+        self.assertEqual(index.search('ул'), [('ул. ленина, 1', 'ул. Ленина, 1')])  # второй адрес не поместился
+        index.add('y', 'Новая')
+        self.assertEqual(index.stats(), {'entries': 3, 'items': 1})
+
+    @override_settings(SUGGEST_REBUILD_INTERVAL=0)
+    def test_stale_index_answers_while_rebuilding(self):
+        labels = ['Ленина, 1']
+        release = threading.Event()
+        index = PrefixIndex(lambda: [(label, label) for label in labels if release.wait(5)], 100)
+        release.set()
+        index.build()
+        release.clear()
+        labels.append('Лесная, 2')
+
+        # Перестройка ждёт release, поиск отвечает по старому индексу
+        self.assertEqual(index.search('ле'), [('Ленина, 1', 'Ленина, 1')])
+        self.assertTrue(index._rebuilding)
+        release.set()
+        for _ in range(100):
+            if not index._rebuilding:
+                break
+            time.sleep(0.01)
+        self.assertEqual([ref for ref, _ in index.search('ле')], ['Ленина, 1', 'Лесная, 2'])
@@ -0,0 +1,241 @@
+"""Векторные тайлы (Mapbox Vector Tile) со слоем активных заявок.
+
+Тайл кэшируется целиком в хранилище, общем для всех процессов (файлы
+TILE_CACHE_DIR/z/x/y.mvt или кэш 'tiles', если он настроен), а при изменении
+заявки сбрасываются только тайлы, в которые попадает её старая и новая точка.
+"""
+import math
+import os
+import tempfile
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .read_model import read_model
+from .sharding import fan_out, regions_for_bbox, route
+
+LAYER_NAME = 'help_requests'
+EXTENT = 4096
+BUFFER = 64  # запас по краю тайла в единицах EXTENT, чтобы маркеры не обрезались
+
+_CACHE_PREFIX = 'tile'
+
+
+def max_zoom():
+    return getattr(settings, 'TILE_MAX_ZOOM', 18)
+
+
+def cache_timeout():
+    return getattr(settings, 'TILE_CACHE_TIMEOUT', 3600)
+
+
+# Проекция Web Mercator
+
+def lnglat_to_world(lng, lat, zoom):
+    """Координаты точки в тайлах на уровне zoom (дробные)"""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    x = (lng + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def world_to_lnglat(x, y, zoom):
+    n = 2 ** zoom
+    lng = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lng, lat
+
+
+def tile_bounds(z, x, y, buffer=BUFFER):
+    """(min_lng, min_lat, max_lng, max_lat) тайла с запасом buffer"""
+    pad = buffer / EXTENT
+    west, north = world_to_lnglat(x - pad, y - pad, z)
+    east, south = world_to_lnglat(x + 1 + pad, y + 1 + pad, z)
+    return west, south, east, north
+
+
+def tiles_for_point(lng, lat, zooms=None, buffer=BUFFER):
+    """Все тайлы, в которые (с учётом запаса) попадает точка"""
+    pad = buffer / EXTENT
+    zooms = range(max_zoom() + 1) if zooms is None else zooms
+    result = []
+    for z in zooms:
+        n = 2 ** z
+        fx, fy = lnglat_to_world(lng, lat, z)
+        xs = {min(max(int(fx + dx), 0), n - 1) for dx in (-pad, 0, pad)}
+        ys = {min(max(int(fy + dy), 0), n - 1) for dy in (-pad, 0, pad)}
+        result.extend((z, tx, ty) for tx in xs for ty in ys)
+    return result
+
+
+# Кодирование protobuf
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(field, value):
+    return _key(field, 0) + _varint(value)
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b''.join(_varint(v) for v in values))
+
+
+def encode_tile(points, z, x, y):
+    """Кодирует точки (id, lat, lng, category, urgency) в MVT со слоем help_requests"""
+    if not points:
+        return b''
+
+    keys = ['category', 'urgency']
+    values, value_index = [], {}
+    features = []
+    for pk, lat, lng, category, urgency in points:
+        fx, fy = lnglat_to_world(lng, lat, z)
+        px = int(round((fx - x) * EXTENT))
+        py = int(round((fy - y) * EXTENT))
+
+        tags = []
+        for key_index, value in enumerate((category, urgency)):
+            if value not in value_index:
+                value_index[value] = len(values)
+                values.append(value)
+            tags.extend((key_index, value_index[value]))
+
+        geometry = [(1 << 3) | 1, _zigzag(px), _zigzag(py)]  # MoveTo, одна точка
+        features.append(
+            _varint_field(1, pk)
+            + _packed_field(2, tags)
+            + _varint_field(3, 1)  # POINT
+            + _packed_field(4, geometry)
+        )
+
+    layer = _varint_field(15, 2) + _bytes_field(1, LAYER_NAME.encode('utf-8'))
+    layer += b''.join(_bytes_field(2, feature) for feature in features)
+    layer += b''.join(_bytes_field(3, key.encode('utf-8')) for key in keys)
+    layer += b''.join(_bytes_field(4, _bytes_field(1, value.encode('utf-8'))) for value in values)
+    layer += _varint_field(5, EXTENT)
+    return _bytes_field(3, layer)
+
+
+# Кэш тайлов
+
+class TileFileStore:
+    """Тайлы файлами root/tile/z/x/y.mvt, срок жизни - в mtime файла.
+
+    В отличие от FileBasedCache запись не обходит каталог для отсечения лишних
+    записей, поэтому set стоит O(1) при любом числе тайлов. Устаревшие файлы
+    перезаписываются при следующем рендере
+    """
+
+    suffix = '.mvt'
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split(':')) + self.suffix
+
+    def get(self, key, default=None):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as tile_file:
+                if os.fstat(tile_file.fileno()).st_mtime < time.time():
+                    return default
+                return tile_file.read()
+        except FileNotFoundError:
+            return default
+
+    def set(self, key, value, timeout):
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Запись во временный файл и os.replace: читатель не увидит недописанный тайл
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tile_file:
+                tile_file.write(value)
+            expires = time.time() + timeout
+            os.utime(tmp_path, (expires, expires))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get_many(self, keys):
+        return {key: tile for key in keys if (tile := self.get(key)) is not None}
+
+    def set_many(self, data, timeout):
+        for key, value in data.items():
+            self.set(key, value, timeout)
+
+    def delete_many(self, keys):
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+
+def tile_cache():
+    """Кэш 'tiles' (Redis, в тестах LocMem), если настроен, иначе файлы в TILE_CACHE_DIR"""
+    if 'tiles' in settings.CACHES:
+        return caches['tiles']
+    return TileFileStore(getattr(settings, 'TILE_CACHE_DIR', '/tmp/charity_tiles'))
+
+
+def cache_key(z, x, y):
+    return f'{_CACHE_PREFIX}:{z}:{x}:{y}'
+
+
+def render_tile(queryset, z, x, y):
+    west, south, east, north = tile_bounds(z, x, y)
+    points = read_model.points(south, west, north, east)
+    if points is not None:
+        return encode_tile(points, z, x, y)
+    points = queryset.filter(
+        latitude__range=(south, north),
+        longitude__range=(west, east),
+    ).order_by('id').values_list('id', 'latitude', 'longitude', 'category', 'urgency')
+    # Тайл на границе регионов собирается из нескольких шардов параллельно
+    parts = fan_out([partial(list, shard_points)
+                     for shard_points in route(points, regions_for_bbox(south, west, north, east), by_region=False)])
+    return encode_tile(sorted(point for part in parts for point in part), z, x, y)
+
+
+def get_tile(queryset, z, x, y):
+    """Тайл из кэша или из queryset активных заявок"""
+    key = cache_key(z, x, y)
+    tile = tile_cache().get(key)
+    if tile is None:
+        tile = render_tile(queryset, z, x, y)
+        tile_cache().set(key, tile, cache_timeout())
+    return tile
+
+
+def invalidate_point(lat, lng):
+    tile_cache().delete_many([cache_key(*tile) for tile in tiles_for_point(lng, lat)])
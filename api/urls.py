@@ -1,8 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
-from .views import HealthCheckView
+from . import views, async_views
+from .views import HealthCheckView, ReadinessCheckView
 
 router = DefaultRouter()
 router.register(r'funds', views.CharityFundViewSet, basename='fund')
@@ -13,6 +13,18 @@ urlpatterns = [
     path('', include(router.urls)),
     path('overview/', views.api_overview, name='api-overview'),
     path('health/', HealthCheckView.as_view(), name='health-check'),
+    path('ready/', ReadinessCheckView.as_view(), name='readiness-check'),
+    
+    # Асинхронные публичные списки (для ASGI)
+    path('async/help-requests/', async_views.AsyncHelpRequestListView.as_view(), name='async-help-requests'),
+    path('async/help-requests/nearby/', async_views.AsyncNearbyHelpRequestsView.as_view(), name='async-help-requests-nearby'),
+    path('async/funds/', async_views.AsyncCharityFundListView.as_view(), name='async-funds'),
+    path('async/fundraisers/', async_views.AsyncFundraiserListView.as_view(), name='async-fundraisers'),
+    
+    # Векторные тайлы карты заявок
+    path('tiles/<int:z>/<int:x>/<int:y>/', views.HelpRequestTileView.as_view(), name='help-request-tile'),
+    
+    path('suggest/', views.suggest_view, name='suggest'),
     
     # Аутентификация
     path('auth/register/', views.UserRegistrationView.as_view(), name='register'),
@@ -30,4 +42,9 @@ urlpatterns = [
     
     # Админка
     path('admin/pending-funds/', views.AdminPendingFundsView.as_view(), name='admin-pending-funds'),
+    path('admin/moderation/', views.ModerationQueueView.as_view(), name='admin-moderation'),
+    path('admin/moderation/claim/', views.moderation_claim_view, name='admin-moderation-claim'),
+    path('admin/moderation/release/', views.moderation_release_view, name='admin-moderation-release'),
+    path('admin/moderation/decide/', views.moderation_decide_view, name='admin-moderation-decide'),
+    path('admin/transitions/', views.StatusTransitionListView.as_view(), name='admin-transitions'),
 ]
\ No newline at end of file
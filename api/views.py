@@ -2,37 +2,86 @@ from rest_framework import viewsets, generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import PermissionDenied
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.db.models import Q
-from .models import CharityFund, HelpRequest, CustomUser, Fundraiser
+from .models import HelpRequest, CustomUser, Fundraiser, StatusTransition
 from .serializers import (
     CharityFundSerializer, HelpRequestSerializer,
     UserRegistrationSerializer, UserProfileSerializer,
-    FundraiserSerializer, FundApprovalSerializer
+    FundraiserSerializer, FundApprovalSerializer,
+    ModerationFundSerializer, ModerationDecisionSerializer, ModerationReleaseSerializer,
+    StatusTransitionSerializer, StatusTransitionFilterSerializer
 )
-from django.http import JsonResponse
+from .fast_serializers import FastListMixin
+from .sharding import sharded
+from .visibility import (
+    visible_funds, owned_funds, owned_fundraisers, is_fund_owner,
+    active_help_requests, sharded_help_requests, sharded_nearby_help_requests
+)
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, Http404
 from django.views import View
-from django.db import connection
 from django.utils import timezone
+from django.conf import settings
+import hashlib
+from asgiref.sync import sync_to_async
+from .health import monitor
+from .read_model import read_model
+from . import moderation, suggest, tiles
+
+
+def _db_status(status):
+    if status['connected'] is None:
+        return "unknown"
+    return "connected" if status['connected'] else f"error: {status['error']}"
 
 
 class HealthCheckView(View):
-    def get(self, request):
-        # Проверка подключения к БД
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT 1")
-            db_status = "connected"
-        except Exception as e:
-            db_status = f"error: {str(e)}"
+    """Liveness: отвечает из кэша статуса БД, не обращаясь к ней"""
+    async def get(self, request):
+        data = {
+            "status": "healthy", 
+            "database": _db_status(monitor.status()),
+            "timestamp": timezone.now().isoformat(),
+            "service": "charity_platform_backend"
+        }
+        if settings.HELP_REQUEST_READ_MODEL:
+            data["read_model"] = read_model.stats()
+        return JsonResponse(data)
+
+
+class ReadinessCheckView(View):
+    """Readiness: БД доступна и миграции применены, проверяет заново, если кэш устарел или плохой"""
+    async def get(self, request):
+        status = monitor.status()
+        if not (monitor.is_ready(status) and monitor.is_fresh(status)):
+            status = await sync_to_async(monitor.probe)()
         
+        ready = monitor.is_ready(status)
         return JsonResponse({
-            "status": "healthy", 
-            "database": db_status,
+            "status": "ready" if ready else "not_ready",
+            "database": _db_status(status),
+            "pending_migrations": status['pending_migrations'],
             "timestamp": timezone.now().isoformat(),
             "service": "charity_platform_backend"
-        })
+        }, status=200 if ready else 503)
+
+
+class HelpRequestTileView(View):
+    """Векторный тайл (MVT) с активными заявками: точки с category и urgency"""
+    async def get(self, request, z, x, y):
+        if z > tiles.max_zoom() or x >= 2 ** z or y >= 2 ** z:
+            raise Http404("Тайл вне диапазона")
+        
+        tile = await sync_to_async(tiles.get_tile)(active_help_requests(), z, x, y)
+        etag = f'"{hashlib.md5(tile).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
+        response['ETag'] = etag
+        response['Cache-Control'] = f'public, max-age={settings.TILE_CLIENT_MAX_AGE}'
+        return response
 
 
 # Permissions
@@ -46,24 +95,18 @@ class IsFundCreator(permissions.BasePermission):
 
 class IsFundOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.creator == request.user
+        return is_fund_owner(request.user, obj)
 
 
 # ViewSets
-class CharityFundViewSet(viewsets.ModelViewSet):
+class CharityFundViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = CharityFundSerializer
     
     def get_queryset(self):
-        # Обычные пользователи видят только одобренные фонды
-        if self.request.user.is_authenticated:
-            if self.request.user.role == 'admin':
-                return CharityFund.objects.all()
-            elif self.request.user.role == 'fund_creator':
-                # Создатели видят свои фонды + одобренные чужие
-                return CharityFund.objects.filter(
-                    Q(creator=self.request.user) | Q(status='approved')
-                )
-        return CharityFund.objects.filter(status='approved', is_active=True)
+        # Обычные пользователи видят только одобренные фонды.
+        # Для списка OR-запрос создателя заменяется на UNION
+        queryset = visible_funds(self.request.user, combine=self.action == 'list')
+        return queryset.order_by('-created_at')
     
     def get_permissions(self):
         if self.action in ['create']:
@@ -75,45 +118,40 @@ class CharityFundViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
     
+    def perform_update(self, serializer):
+        serializer.instance.changed_by = self.request.user
+        serializer.save()
+    
+    def _decide(self, request, status, message):
+        # Статус и запись в журнал меняются в одной транзакции
+        fund = self.get_object()
+        decided = moderation.decide_funds(request.user, [fund.pk], status, request.data.get('reason', ''))
+        if not decided and fund.status != status:
+            return Response({'error': 'Фонд проверяет другой администратор'}, status=409)
+        return Response({'status': message})
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def approve(self, request, pk=None):
         """Одобрить фонд"""
-        fund = self.get_object()
-        fund.status = 'approved'
-        fund.save()
-        
-        print(f"✅ Фонд '{fund.name}' одобрен. Создатель: {fund.creator.username}, роль: {fund.creator.role}")
-        
-        return Response({'status': 'Фонд одобрен'})
+        return self._decide(request, 'approved', 'Фонд одобрен')
     
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def reject(self, request, pk=None):
         """Отклонить фонд"""
-        fund = self.get_object()
-        fund.status = 'rejected'
-        fund.rejection_reason = request.data.get('reason', '')
-        fund.save()
-        return Response({'status': 'Фонд отклонен'})
+        return self._decide(request, 'rejected', 'Фонд отклонен')
 
 
-class HelpRequestViewSet(viewsets.ModelViewSet):
-    queryset = HelpRequest.objects.filter(is_active=True, is_fulfilled=False)
+class HelpRequestViewSet(FastListMixin, viewsets.ModelViewSet):
+    queryset = HelpRequest.objects.filter(is_active=True, is_fulfilled=False, duplicate_of__isnull=True)
     serializer_class = HelpRequestSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        queryset = HelpRequest.objects.filter(is_active=True, is_fulfilled=False)
-        
         # Фильтрация
         category = self.request.query_params.get('category', None)
         urgency = self.request.query_params.get('urgency', None)
-        
-        if category:
-            queryset = queryset.filter(category=category)
-        if urgency:
-            queryset = queryset.filter(urgency=urgency)
-            
-        return queryset
+        region = self.request.query_params.get('region', None)
+        return sharded_help_requests(category, urgency, region)
     
     @action(detail=False, methods=['get'])
     def nearby(self, request):
@@ -124,21 +162,24 @@ class HelpRequestViewSet(viewsets.ModelViewSet):
         if not lat or not lng:
             return Response({'error': 'Требуются параметры lat и lng'}, status=400)
         
+        category = request.query_params.get('category')
+        urgency = request.query_params.get('urgency')
+        
         try:
             lat = float(lat)
             lng = float(lng)
             radius = float(radius)
             
-            lat_range = 0.09 * radius
-            lng_range = 0.14 * radius
+            # Из модели чтения в памяти, если она включена и загружена
+            body = read_model.nearby_json(lat, lng, radius, category, urgency)
+            if body is not None:
+                return HttpResponse(body, content_type='application/json')
             
-            nearby_requests = HelpRequest.objects.filter(
-                latitude__range=(lat - lat_range, lat + lat_range),
-                longitude__range=(lng - lng_range, lng + lng_range),
-                is_active=True,
-                is_fulfilled=False
-            )
+            nearby_requests = sharded_nearby_help_requests(lat, lng, radius, category, urgency)
             
+            response = self.fast_response(nearby_requests, paginate=False)
+            if response is not None:
+                return response
             serializer = self.get_serializer(nearby_requests, many=True)
             return Response(serializer.data)
             
@@ -146,7 +187,7 @@ class HelpRequestViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Неверные координаты'}, status=400)
 
 
-class FundraiserViewSet(viewsets.ModelViewSet):
+class FundraiserViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = FundraiserSerializer
     
     def get_queryset(self):
@@ -161,11 +202,15 @@ class FundraiserViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated(), IsFundCreator()]
         return [permissions.AllowAny()]
     
+    def perform_update(self, serializer):
+        serializer.instance.changed_by = self.request.user
+        serializer.save()
+    
     def perform_create(self, serializer):
         # Проверяем, что пользователь создатель этого фонда
         fund = serializer.validated_data['fund']
-        if fund.creator != self.request.user:
-            raise permissions.PermissionDenied("Вы не являетесь владельцем этого фонда")
+        if not is_fund_owner(self.request.user, fund):
+            raise PermissionDenied("Вы не являетесь владельцем этого фонда")
         serializer.save()
 
 
@@ -184,11 +229,44 @@ def api_overview(request):
             'my-requests': '/api/my-requests/',
             'my-funds': '/api/my-funds/',
             'admin-pending-funds': '/api/admin/pending-funds/',
+            'admin-moderation': '/api/admin/moderation/',
+            'admin-transitions': '/api/admin/transitions/',
+            'health': '/api/health/',
+            'tiles': '/api/tiles/{z}/{x}/{y}/',
+            'suggest': '/api/suggest/?q=',
+            'ready': '/api/ready/',
+            'async-help-requests': '/api/async/help-requests/',
+            'async-help-requests-nearby': '/api/async/help-requests/nearby/',
+            'async-funds': '/api/async/funds/',
+            'async-fundraisers': '/api/async/fundraisers/',
         }
     }
     return Response(api_urls)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def suggest_view(request):
+    """Подсказки по префиксу: названия одобренных фондов и адреса заявок"""
+    query = request.query_params.get('q', '')
+    kind = request.query_params.get('type')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), settings.SUGGEST_MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'Неверный параметр limit'}, status=400)
+    
+    result = {}
+    if kind in (None, 'funds'):
+        result['funds'] = [
+            {'id': pk, 'name': name} for pk, name in suggest.fund_index.search(query, limit)
+        ]
+    if kind in (None, 'addresses'):
+        result['addresses'] = [address for _, address in suggest.address_index.search(query, limit)]
+    if not result:
+        return Response({'error': 'Параметр type должен быть funds или addresses'}, status=400)
+    return Response(result)
+
+
 # Auth views
 class UserRegistrationView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
@@ -232,12 +310,12 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class UserHelpRequestsView(generics.ListAPIView):
+class UserHelpRequestsView(FastListMixin, generics.ListAPIView):
     serializer_class = HelpRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return HelpRequest.objects.filter(user=self.request.user).order_by('-created_at')
+        return sharded(HelpRequest.objects.filter(user=self.request.user).order_by('-created_at'))
 
 
 class HelpRequestCreateView(generics.CreateAPIView):
@@ -249,30 +327,90 @@ class HelpRequestCreateView(generics.CreateAPIView):
 
 
 # Admin views
-class AdminPendingFundsView(generics.ListAPIView):
+class AdminPendingFundsView(FastListMixin, generics.ListAPIView):
     """Список фондов на проверке для админа"""
     serializer_class = CharityFundSerializer
     permission_classes = [IsAdminUser]
     
     def get_queryset(self):
-        return CharityFund.objects.filter(status='pending').order_by('-created_at')
+        return moderation.pending_funds().order_by('-created_at')
+
+
+class ModerationQueueView(FastListMixin, generics.ListAPIView):
+    """Очередь модерации: свободные фонды и закреплённые за текущим админом"""
+    serializer_class = ModerationFundSerializer
+    permission_classes = [IsAdminUser]
+    
+    def get_queryset(self):
+        return moderation.moderation_queue(self.request.user)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def moderation_claim_view(request):
+    """Закрепить за собой пачку фондов из очереди"""
+    try:
+        limit = min(max(int(request.data.get('limit', 10)), 1), moderation.batch_limit())
+    except (TypeError, ValueError):
+        return Response({'error': 'Неверный параметр limit'}, status=400)
+    funds = moderation.claim_funds(request.user, limit)
+    return Response(ModerationFundSerializer(funds, many=True, context={'request': request}).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def moderation_release_view(request):
+    """Вернуть закреплённые фонды в очередь (все или перечисленные в ids)"""
+    serializer = ModerationReleaseSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data.get('ids')
+    return Response({'released': moderation.release_funds(request.user, ids)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def moderation_decide_view(request):
+    """Одобрить или отклонить пачку фондов"""
+    serializer = ModerationDecisionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    decided = moderation.decide_funds(request.user, data['ids'], data['status'], data['reason'])
+    decided_ids = set(decided)
+    return Response({
+        'decided': decided,
+        'skipped': [pk for pk in data['ids'] if pk not in decided_ids],
+    })
+
+
+class StatusTransitionListView(generics.ListAPIView):
+    """Журнал смены статусов фондов и сборов"""
+    serializer_class = StatusTransitionSerializer
+    permission_classes = [IsAdminUser]
+    
+    def get_queryset(self):
+        queryset = StatusTransition.objects.select_related('actor')
+        # Пустые параметры игнорируем, как и раньше
+        filters = StatusTransitionFilterSerializer(
+            data={key: value for key, value in self.request.query_params.items() if value}
+        )
+        filters.is_valid(raise_exception=True)
+        return queryset.filter(**filters.validated_data)
 
 
-class MyFundsView(generics.ListAPIView):
+class MyFundsView(FastListMixin, generics.ListAPIView):
     """Мои фонды для создателя"""
     serializer_class = CharityFundSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return CharityFund.objects.filter(creator=self.request.user).order_by('-created_at')
+        return owned_funds(self.request.user).order_by('-created_at')
 
 
-class MyFundraisersView(generics.ListAPIView):
+class MyFundraisersView(FastListMixin, generics.ListAPIView):
     """Мои сборы для создателя фонда"""
     serializer_class = FundraiserSerializer
     permission_classes = [IsFundCreator]
     
     def get_queryset(self):
         # Возвращаем сборы всех фондов пользователя
-        user_funds = CharityFund.objects.filter(creator=self.request.user)
-        return Fundraiser.objects.filter(fund__in=user_funds).order_by('-created_at')
\ No newline at end of file
+        return owned_fundraisers(self.request.user).order_by('-created_at')
\ No newline at end of file
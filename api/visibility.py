@@ -0,0 +1,95 @@
+"""Видимость фондов и сборов в зависимости от роли пользователя.
+
+Публичность фонда хранится денормализованно в CharityFund.is_public, поэтому
+анонимный список - это один индексный поиск. Для создателей фондов объединение
+"свои + одобренные" строится через UNION двух индексных запросов.
+"""
+from django.db.models import Q
+
+from .models import CharityFund, Fundraiser, HelpRequest
+from .sharding import regions_for_bbox, sharded
+
+
+def public_funds():
+    return CharityFund.objects.filter(is_public=True)
+
+
+def _admin_funds(user, combine):
+    return CharityFund.objects.all()
+
+
+def _creator_funds(user, combine):
+    # Создатели видят свои фонды + одобренные чужие
+    if combine:
+        own = CharityFund.objects.filter(creator_id=user.pk)
+        approved = CharityFund.objects.filter(status='approved')
+        return own.union(approved)
+    return CharityFund.objects.filter(Q(creator_id=user.pk) | Q(status='approved'))
+
+
+FUND_SCOPES = {
+    'admin': _admin_funds,
+    'fund_creator': _creator_funds,
+}
+
+
+def visible_funds(user, combine=False):
+    """Фонды, которые видит пользователь.
+
+    combine=True разрешает UNION: такой queryset можно только сортировать,
+    срезать и считать, поэтому он годится для списков, но не для get_object.
+    """
+    scope = FUND_SCOPES.get(user.role) if user.is_authenticated else None
+    if scope is None:
+        return public_funds()
+    return scope(user, combine)
+
+
+def owned_funds(user):
+    return CharityFund.objects.filter(creator_id=user.pk)
+
+
+def owned_fundraisers(user):
+    return Fundraiser.objects.filter(fund__creator_id=user.pk)
+
+
+def is_fund_owner(user, fund):
+    """Сравнение по id, без загрузки fund.creator"""
+    return fund.creator_id == user.pk
+
+
+def active_help_requests(category=None, urgency=None):
+    """Активные заявки с фильтрами по категории и срочности"""
+    queryset = HelpRequest.objects.filter(is_active=True, is_fulfilled=False, duplicate_of__isnull=True)
+    if category:
+        queryset = queryset.filter(category=category)
+    if urgency:
+        queryset = queryset.filter(urgency=urgency)
+    return queryset
+
+
+def nearby_bounds(lat, lng, radius):
+    """(юг, запад, север, восток) прямоугольника вокруг точки, radius в км"""
+    lat_range = 0.09 * radius
+    lng_range = 0.14 * radius
+    return lat - lat_range, lng - lng_range, lat + lat_range, lng + lng_range
+
+
+def nearby_help_requests(lat, lng, radius, category=None, urgency=None):
+    """Активные заявки в прямоугольнике вокруг точки, radius в км"""
+    south, west, north, east = nearby_bounds(lat, lng, radius)
+    return active_help_requests(category, urgency).filter(
+        latitude__range=(south, north),
+        longitude__range=(west, east),
+    )
+
+
+def sharded_help_requests(category=None, urgency=None, region=None):
+    """Активные заявки во всех шардах или только в шарде региона"""
+    return sharded(active_help_requests(category, urgency), [region] if region else None)
+
+
+def sharded_nearby_help_requests(lat, lng, radius, category=None, urgency=None):
+    """nearby_help_requests только в шардах регионов, которые задевает прямоугольник"""
+    return sharded(nearby_help_requests(lat, lng, radius, category, urgency),
+                   regions_for_bbox(*nearby_bounds(lat, lng, radius)), by_region=False)
@@ -0,0 +1,24 @@
+"""
+Конфигурация gunicorn для API-контейнера.
+
+Приложение загружается в мастере (preload_app) и прогревается до форка,
+так что воркеры стартуют с уже импортированными модулями.
+
+    gunicorn -c charity_platform/gunicorn.conf.py charity_platform.asgi:application
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 10
+accesslog = '-'
+
+
+def when_ready(server):
+    # Вызывается в мастере после загрузки приложения и до запуска воркеров
+    from charity_platform.warmup import warm_up
+    warm_up()
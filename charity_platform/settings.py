@@ -3,9 +3,12 @@ Django settings for charity_platform project.
 """
 
 from pathlib import Path
+import json
 import os
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -66,9 +69,49 @@ WSGI_APPLICATION = 'charity_platform.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': '/tmp/db.sqlite3',  # Используем /tmp для гарантированных прав в Docker
+        # В docker-compose путь указывает на том, общий для сервисов migrate и backend
+        'NAME': os.getenv('SQLITE_PATH', '/tmp/db.sqlite3'),
+    }
+}
+
+# PostgreSQL, если заданы переменные окружения (например, для scale_suite)
+if os.getenv('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB'),
+        'USER': os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
     }
+
+# Шардирование заявок по регионам: JSON {регион: настройки БД}, например
+# {"moscow": {"ENGINE": "django.db.backends.sqlite3", "NAME": "/tmp/moscow.sqlite3"}}.
+# Регионы без шарда лежат в default
+HELP_REQUEST_SHARDS = json.loads(os.getenv('HELP_REQUEST_SHARDS', '{}'))
+
+# Границы регионов: (юг, запад, север, восток)
+HELP_REQUEST_REGIONS = {
+    'moscow': {'bounds': (54.8, 36.3, 56.6, 39.0)},
+    'spb': {'bounds': (59.4, 29.0, 60.5, 31.3)},
+    'kazan': {'bounds': (55.3, 48.3, 56.3, 49.9)},
+    'yekaterinburg': {'bounds': (56.3, 59.7, 57.4, 61.5)},
+    'novosibirsk': {'bounds': (54.5, 82.1, 55.5, 83.8)},
+    'krasnodar': {'bounds': (44.5, 38.1, 45.6, 39.8)},
 }
+HELP_REQUEST_DEFAULT_REGION = 'other'  # заявки вне всех регионов
+
+for _region, _database in HELP_REQUEST_SHARDS.items():
+    if _region not in HELP_REQUEST_REGIONS:
+        raise ImproperlyConfigured(
+            f"HELP_REQUEST_SHARDS: неизвестный регион '{_region}', "
+            f"допустимы: {', '.join(HELP_REQUEST_REGIONS)}"
+        )
+    DATABASES[f'shard_{_region}'] = _database
+    HELP_REQUEST_REGIONS[_region]['database'] = f'shard_{_region}'
+
+DATABASE_ROUTERS = ['api.db_routers.RegionRouter']
+SHARD_FANOUT_WORKERS = 8  # потоков для параллельных запросов в шарды
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -131,4 +174,55 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
 # Health check endpoint settings (для Docker healthcheck)
-HEALTH_CHECK_ENDPOINT = '/api/health/'
\ No newline at end of file
+HEALTH_CHECK_ENDPOINT = '/api/health/'
+READINESS_CHECK_ENDPOINT = '/api/ready/'
+HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', '10'))  # секунды между фоновыми проверками БД
+
+# Дедупликация заявок на помощь: 'flag' - помечать дубликаты, 'merge' - возвращать
+# существующую заявку вместо создания новой, 'off' - не проверять
+HELP_REQUEST_DEDUP_MODE = os.getenv('HELP_REQUEST_DEDUP_MODE', 'flag')
+HELP_REQUEST_DEDUP_THRESHOLD = 0.7
+HELP_REQUEST_DEDUP_WINDOW_DAYS = 14
+HELP_REQUEST_DEDUP_CELL = 0.005  # размер геоячейки в градусах (~500 м)
+HELP_REQUEST_DEDUP_MAX_CANDIDATES = 200  # самых новых кандидатов, ограничивает работу в плотных ячейках
+
+# Векторные тайлы заявок
+# Кэш тайлов общий для всех воркеров gunicorn: сигнал сбрасывает тайл в том
+# процессе, который сохранил заявку, и локальный кэш (LocMemCache) остальных
+# воркеров отдавал бы устаревший тайл до TILE_CACHE_TIMEOUT. По умолчанию
+# тайлы пишутся файлами TILE_CACHE_DIR/tile/z/x/y.mvt (воркеры одного
+# контейнера), для нескольких контейнеров - кэш 'tiles' в Redis.
+# FileBasedCache не подходит: с MAX_ENTRIES каждый set обходит весь каталог
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+TILE_CACHE_DIR = os.getenv('TILE_CACHE_DIR', '/tmp/charity_tiles')
+if os.getenv('TILE_CACHE_REDIS_URL'):
+    CACHES['tiles'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('TILE_CACHE_REDIS_URL'),
+    }
+TILE_MAX_ZOOM = 18
+TILE_CACHE_TIMEOUT = 3600  # кэш тайла на сервере, сбрасывается по изменению заявок
+TILE_CLIENT_MAX_AGE = 60
+
+# Модель чтения активных заявок в памяти процесса (nearby и тайлы без запросов к БД)
+HELP_REQUEST_READ_MODEL = os.getenv('HELP_REQUEST_READ_MODEL', 'False').lower() == 'true'
+READ_MODEL_CELL = 0.05  # размер ячейки сетки в градусах (~5 км)
+# Память модели - в каждом воркере: ~420 байт на активную заявку (колонки ~35,
+# поля JSON ~285, индексы ~100), на 72 тыс. заявок ~30 МБ, при лимите ~85 МБ
+READ_MODEL_MAX_ROWS = 200000  # при большем числе активных заявок модель не строится
+READ_MODEL_SYNC_INTERVAL = 5  # секунды между догрузками по курсору updated_at
+READ_MODEL_SYNC_OVERLAP = 60  # секунды перекрытия курсора, больше самой долгой транзакции записи
+READ_MODEL_REBUILD_INTERVAL = 600  # полная перестройка, подхватывает удаления и update()
+
+# Очередь модерации фондов
+MODERATION_LEASE_SECONDS = 600  # на сколько фонд закрепляется за админом
+MODERATION_BATCH_LIMIT = 100  # фондов в одном пакетном решении или закреплении
+
+# Подсказки по префиксу (индекс в памяти процесса)
+SUGGEST_MAX_ENTRIES = 100000  # ключей на индекс, ограничивает память
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_REBUILD_INTERVAL = 300  # секунды, подхватывает изменения из других процессов
\ No newline at end of file
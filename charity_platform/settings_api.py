@@ -0,0 +1,40 @@
+"""
+Профиль настроек для API-контейнера.
+
+Без админки, сессий, сообщений и статики: API аутентифицируется по JWT,
+поэтому эти приложения и их middleware только замедляют старт и запросы.
+Миграции применяются отдельной задачей с полными настройками.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+_UNUSED_APPS = {
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+}
+
+_UNUSED_MIDDLEWARE = {
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in _UNUSED_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in _UNUSED_MIDDLEWARE]
+
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.contrib.messages.context_processors.messages'
+]
+
+ROOT_URLCONF = 'charity_platform.urls_api'
+
+# Только JSON: браузерный API тянет шаблоны и статику
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
@@ -0,0 +1,21 @@
+"""
+Профиль настроек для тестов.
+
+Заявки региона moscow лежат во втором шарде, поэтому тесты проходят через
+маршрутизацию и слияние результатов из нескольких баз. Кэш тайлов в памяти
+процесса, чтобы тайлы не переживали прогон.
+
+python manage.py test --settings charity_platform.settings_test
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES['shard_moscow'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': '/tmp/shard_moscow.sqlite3',
+}
+HELP_REQUEST_REGIONS['moscow']['database'] = 'shard_moscow'
+
+CACHES['tiles'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}
@@ -0,0 +1,21 @@
+"""
+Прогрев импортов до форка воркеров.
+
+При preload gunicorn импортирует приложение в мастер-процессе; здесь же
+загружаем URLconf, представления, сериализаторы и рендереры DRF, которые
+иначе импортировались бы лениво на первом запросе в каждом воркере.
+Форкнутые воркеры разделяют эти страницы памяти с мастером.
+"""
+from importlib import import_module
+
+
+def warm_up():
+    from django.conf import settings
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    for path in settings.REST_FRAMEWORK.get('DEFAULT_RENDERER_CLASSES', ()):
+        import_module(path.rpartition('.')[0])
+    for path in settings.REST_FRAMEWORK.get('DEFAULT_AUTHENTICATION_CLASSES', ()):
+        import_module(path.rpartition('.')[0])
+    import_module('rest_framework.pagination')
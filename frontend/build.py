@@ -0,0 +1,169 @@
+"""Сборка статического фронтенда.
+
+Склеивает и минифицирует JS/CSS из src/, добавляет хэш содержимого в имена
+файлов и рядом кладёт сжатые копии .gz/.br для frontend.serve.
+
+    python -m frontend.build --src src --out dist
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него собираем только .gz
+    brotli = None
+
+HASH_LENGTH = 10
+COMPRESSIBLE = {'.html', '.js', '.css', '.json', '.svg', '.txt'}
+
+_STYLESHEET_RE = re.compile(r'[ \t]*<link rel="stylesheet" href="(?!https?:|//)([^"]+)">\n?')
+_SCRIPT_RE = re.compile(r'[ \t]*<script src="(?!https?:|//)([^"]+)"></script>\n?')
+
+# Символы, после которых '/' в JS начинает регулярное выражение, а не деление
+_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^')
+
+
+def minify_js(source):
+    """Удаляет комментарии, отступы и пустые строки.
+
+    Переводы строк сохраняются, чтобы не сломать автоматическую расстановку
+    точек с запятой. Строки, шаблоны и регулярные выражения не трогаются.
+    """
+    out = []
+    i, n = 0, len(source)
+    last = ''  # последний значимый символ кода
+    while i < n:
+        ch = source[i]
+        nxt = source[i + 1] if i + 1 < n else ''
+        if ch in '\'"`':
+            j = i + 1
+            while j < n and source[j] != ch:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            last = ch
+            i = j + 1
+        elif ch == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+        elif ch == '/' and nxt == '/':
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+        elif ch == '/' and (last in _REGEX_PREFIX or not last):
+            j, in_class = i + 1, False
+            while j < n and source[j] != '\n':
+                if source[j] == '\\':
+                    j += 2
+                    continue
+                if source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                elif source[j] == '/' and not in_class:
+                    break
+                j += 1
+            out.append(source[i:j + 1])
+            last = '/'
+            i = j + 1
+        else:
+            out.append(ch)
+            if not ch.isspace():
+                last = ch
+            i += 1
+
+    lines = (line.strip() for line in ''.join(out).splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+def minify_css(source):
+    """Удаляет комментарии и лишние пробелы вокруг { } ; , и после :"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip() + '\n'
+
+
+def fingerprint(name, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, dot, suffix = name.rpartition('.')
+    return f'{stem}.{digest}.{suffix}' if dot else f'{name}.{digest}'
+
+
+def compress(path):
+    """Кладёт рядом .gz и .br, если они меньше оригинала"""
+    data = path.read_bytes()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, packed in variants:
+        if len(packed) < len(data):
+            path.with_name(path.name + suffix).write_bytes(packed)
+
+
+def bundle(src, names, minify, separator):
+    return separator.join(minify((src / name).read_text(encoding='utf-8')) for name in names).encode('utf-8')
+
+
+def build(src, out, entry='index.html'):
+    src, out = Path(src), Path(out)
+    if out.exists():
+        shutil.rmtree(out)
+    out.mkdir(parents=True)
+
+    html = (src / entry).read_text(encoding='utf-8')
+    stylesheets = _STYLESHEET_RE.findall(html)
+    scripts = _SCRIPT_RE.findall(html)
+    manifest = {}
+
+    # Бандлы подставляются на место первого подключения, порядок файлов сохраняется
+    for kind, names, pattern, minify, separator, tag in (
+        ('css', stylesheets, _STYLESHEET_RE, minify_css, '', '    <link rel="stylesheet" href="{}">\n'),
+        ('js', scripts, _SCRIPT_RE, minify_js, ';\n', '    <script src="{}"></script>\n'),
+    ):
+        if not names:
+            continue
+        content = bundle(src, names, minify, separator)
+        hashed = fingerprint(f'bundle.{kind}', content)
+        (out / hashed).write_bytes(content)
+        manifest.update({name: hashed for name in names})
+
+        first = pattern.search(html)
+        html = html[:first.start()] + tag.format(hashed) + pattern.sub('', html[first.start():])
+
+    # Остальные файлы копируются как есть под исходными именами
+    bundled = set(manifest)
+    for path in src.rglob('*'):
+        relative = path.relative_to(src).as_posix()
+        if path.is_dir() or relative in bundled or relative == entry or path.name.startswith('.'):
+            continue
+        target = out / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, target)
+
+    (out / entry).write_text(html, encoding='utf-8')
+    (out / 'manifest.json').write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    for path in list(out.rglob('*')):
+        if path.is_file() and path.suffix in COMPRESSIBLE:
+            compress(path)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сборка фронтенда')
+    parser.add_argument('--src', default='src')
+    parser.add_argument('--out', default='dist')
+    args = parser.parse_args()
+
+    manifest = build(args.src, args.out)
+    for name, hashed in manifest.items():
+        print(f'{name} -> {hashed}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Статический сервер для собранного фронтенда.
+
+Отдаёт предсжатые .br/.gz копии по Accept-Encoding, ставит долгий immutable
+кэш на файлы с хэшем в имени, поддерживает Range и условные GET.
+
+    python -m frontend.serve --root dist --port 3000
+"""
+import argparse
+import mimetypes
+import posixpath
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from .build import HASH_LENGTH
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE = 'public, max-age=3600'
+ENTRY_CACHE = 'no-cache'
+
+# Порядок важен: brotli предпочтительнее gzip
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_HASHED_RE = re.compile(r'\.[0-9a-f]{%d}\.' % HASH_LENGTH)
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CHUNK_SIZE = 64 * 1024
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """Возвращает (start, end) включительно, None для полного ответа или False для 416"""
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None  # несколько диапазонов и прочие формы отдаём целиком
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class StaticHandler(BaseHTTPRequestHandler):
+    root = Path('dist')
+    entry = 'index.html'
+    server_version = 'CharityStatic/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _resolve(self):
+        path = posixpath.normpath(unquote(urlsplit(self.path).path)).lstrip('/')
+        if path in ('', '.'):
+            path = self.entry
+        target = (self.root / path).resolve()
+        if self.root.resolve() not in target.parents or not target.is_file():
+            return None, None
+        return target, path
+
+    def _cache_control(self, path):
+        if path == self.entry:
+            return ENTRY_CACHE
+        if _HASHED_RE.search(posixpath.basename(path)):
+            return IMMUTABLE_CACHE
+        return DEFAULT_CACHE
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _serve(self, send_body):
+        target, path = self._resolve()
+        if target is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        # Выбираем предсжатую копию, если клиент её принимает
+        accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+        encoding, body_path = None, target
+        for name, suffix in ENCODINGS:
+            candidate = target.with_name(target.name + suffix)
+            if name in accepted and candidate.is_file():
+                encoding, body_path = name, candidate
+                break
+
+        stat = body_path.stat()
+        size = stat.st_size
+        etag = '"%x-%x%s"' % (stat.st_mtime_ns, size, '-' + encoding if encoding else '')
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+
+        headers = {
+            'Cache-Control': self._cache_control(path),
+            'ETag': etag,
+            'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+            'Accept-Ranges': 'bytes',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if self._not_modified(etag, stat.st_mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._send_headers(headers)
+            return
+
+        byte_range = None
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if range_header and (if_range is None or if_range.strip() == etag):
+            byte_range = parse_range(range_header, size)
+
+        if byte_range is False:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            headers['Content-Range'] = f'bytes */{size}'
+            headers['Content-Length'] = '0'
+            self._send_headers(headers)
+            return
+
+        start, end = byte_range or (0, size - 1)
+        if byte_range:
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            self.send_response(HTTPStatus.OK)
+        headers['Content-Type'] = content_type
+        headers['Content-Length'] = str(end - start + 1 if size else 0)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        self._send_headers(headers)
+
+        if send_body and size:
+            with open(body_path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+    def _send_headers(self, headers):
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Статический сервер фронтенда')
+    parser.add_argument('--root', default='dist')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=3000)
+    args = parser.parse_args()
+
+    StaticHandler.root = Path(args.root)
+    server = ThreadingHTTPServer((args.host, args.port), StaticHandler)
+    print(f'Serving {args.root} on http://{args.host}:{args.port}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,6 @@
 echo "Активация виртуального окружения..."
 source venv/bin/activate
 
-echo "Создание миграций..."
-python manage.py makemigrations
-
 echo "Применение миграций..."
 python manage.py migrate
 